@@ -0,0 +1,18 @@
+import os
+import sys
+
+# the modules of the viewer import each other as top level modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+#
+#   python -m consult_viewer [--port PORT] ...            starts the viewer
+#   python -m consult_viewer --headless --port PORT ...   records without the GUI, see headless.py
+#
+if __name__ == "__main__":
+    if "--headless" in sys.argv[1:]:
+        sys.argv.remove("--headless")
+        from headless import main
+        sys.exit(main())
+
+    from mainview import main
+    main()
@@ -0,0 +1,44 @@
+from PySide6.QtCore import QThread, Signal
+
+from consultlink import ConsultSession, StreamPoller
+
+
+class AcquisitionThread(QThread):
+    '''
+    Owns the Consult serial session. Frames are emitted through a queued signal so
+    the GUI thread never blocks on serial I/O. Lost links are reconnected on this
+    thread; linkStatusChanged reports every connect, loss and retry.
+    '''
+    frameReceived = Signal(object)
+    linkStatusChanged = Signal(bool, str)  # connected, message
+
+    def __init__(self, port_url: str, parent=None):
+        super().__init__(parent)
+        self._poller = StreamPoller(ConsultSession(port_url), self.linkStatusChanged.emit)
+        self._poller.add_sink(self.frameReceived.emit)
+
+    @property
+    def frames_dropped(self):
+        return self._poller.frames_discarded
+
+    def add_frame_sink(self, sink):
+        '''
+        Registers a callable that receives every frame directly on the acquisition thread.
+        '''
+        self._poller.add_sink(sink)
+
+    def remove_frame_sink(self, sink):
+        self._poller.remove_sink(sink)
+
+    def set_parameters(self, params):
+        self._poller.set_parameters(params)
+
+    def set_target_rates(self, target_rates):
+        self._poller.set_target_rates(target_rates)
+
+    def stop(self):
+        self._poller.stop()
+        self.wait()
+
+    def run(self):
+        self._poller.run()
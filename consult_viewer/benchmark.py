@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import PySide6
+from PySide6.QtCore import QObject, QEvent, QThread, Signal, QElapsedTimer
+from PySide6.QtWidgets import QApplication
+import consult_interface as consult
+
+from consultlink import Frame, StreamLayout
+from parametertable import ConsultParameterTableModel, ParameterTableView
+from statuslog import StatusLogView
+
+#
+# Headless benchmarks of the table, log and acquisition paths. Every benchmark
+# reports pytest-benchmark style statistics in seconds per round, and the whole run
+# is written as JSON so results can be compared between releases:
+#
+#   python benchmark.py --out results.json
+#
+
+
+def measure(func, rounds, warmup=1):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def summarize(samples):
+    return {
+        "min": min(samples),
+        "max": max(samples),
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": len(samples),
+    }
+
+
+def enable_parameters(count):
+    params = consult.Definition.get_parameters()
+    for i, param in enumerate(params):
+        param.enable(i < count)
+    return consult.Definition.get_enabled_parameters()
+
+
+def random_frame(layout):
+    payload = bytes(random.randrange(256) for _ in range(layout.frame_length))
+    return Frame(time.monotonic_ns(), layout.param_ids, payload, layout.decode(payload))
+
+
+class FakeFrameSource(QThread):
+    '''
+    Stands in for the AcquisitionThread, emitting random frames for the enabled
+    parameters at a fixed rate.
+    '''
+    frameReceived = Signal(object)
+
+    def __init__(self, params, rate, duration, parent=None):
+        super().__init__(parent)
+        self._layout = StreamLayout(params)
+        self._interval = 1.0 / rate
+        self._duration = duration
+
+    def run(self):
+        start = time.monotonic()
+        next_frame = start
+        while time.monotonic() - start < self._duration:
+            self.frameReceived.emit(random_frame(self._layout))
+            next_frame += self._interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class PaintLatencyProbe(QObject):
+    '''
+    Measures the time from the receipt of the oldest frame not yet on screen to
+    the next paint of the table.
+    '''
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.latencies = []
+        self._pending_ns = None
+
+    def frame_received(self, frame):
+        if self._pending_ns is None:
+            self._pending_ns = frame.timestamp_ns
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint and self._pending_ns is not None:
+            self.latencies.append((time.monotonic_ns() - self._pending_ns) / 1e9)
+            self._pending_ns = None
+        return False
+
+
+def bench_table_data(counts, rounds):
+    results = []
+    for count in counts:
+        enable_parameters(count)
+        model = ConsultParameterTableModel()
+        layout = StreamLayout(consult.Definition.get_enabled_parameters())
+        model.frame_received(random_frame(layout))
+        indexes = [model.index(row, column) for row in range(model.rowCount()) for column in range(3)]
+
+        def read_all():
+            for index in indexes:
+                model.data(index)
+        results.append({"name": "table_data", "params": {"parameters": model.rowCount()},
+                        "stats": measure(read_all, rounds)})
+    return results
+
+
+def bench_update_values(counts, rounds, frames=100):
+    results = []
+    for count in counts:
+        enable_parameters(count)
+        model = ConsultParameterTableModel()
+        layout = StreamLayout(consult.Definition.get_enabled_parameters())
+        batch = [random_frame(layout) for _ in range(frames)]
+
+        def dispatch():
+            for frame in batch:
+                model.frame_received(frame)
+            model.flush_updates()
+        results.append({"name": "update_values", "params": {"parameters": model.rowCount(), "frames": frames},
+                        "stats": measure(dispatch, rounds), "counters": model.update_counters()})
+    return results
+
+
+def bench_parameters_changed(counts, rounds):
+    results = []
+    for count in counts:
+        enable_parameters(count)
+        model = ConsultParameterTableModel()
+        results.append({"name": "parameters_changed", "params": {"parameters": model.rowCount()},
+                        "stats": measure(model.parameters_changed, rounds)})
+    return results
+
+
+def bench_status_log(rounds, records=10000):
+    view = StatusLogView()
+    logger = logging.getLogger("benchmark")
+    logger.propagate = False
+    logger.addHandler(view.handler)
+    logger.setLevel(logging.DEBUG)
+
+    def ingest():
+        for i in range(records):
+            logger.debug("benchmark record %d", i)
+        view.flush()
+    stats = measure(ingest, rounds)
+    logger.removeHandler(view.handler)
+    logging.getLogger().removeHandler(view.handler)
+    return [{"name": "status_log_ingest", "params": {"records": records},
+             "stats": stats, "records_per_second": records / stats["median"]}]
+
+
+def bench_frame_to_paint(app, count, rate, duration):
+    params = enable_parameters(count)
+    view = ParameterTableView(None)
+    view.resize(600, 800)
+    view.show()
+    probe = PaintLatencyProbe(view)
+    view.viewport().installEventFilter(probe)
+
+    source = FakeFrameSource(params, rate, duration)
+    source.frameReceived.connect(view.frame_received)
+    view.valuesChanged.connect(probe.frame_received)
+    source.start()
+    timer = QElapsedTimer()
+    timer.start()
+    while not source.isFinished() or timer.elapsed() < duration * 1000 + 200:
+        app.processEvents()
+    source.wait()
+    view.close()
+
+    if not probe.latencies:
+        return []
+    latencies = sorted(probe.latencies)
+    stats = summarize(latencies)
+    stats["p99"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return [{"name": "frame_to_paint", "params": {"parameters": len(params), "rate": rate, "duration": duration},
+             "stats": stats}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consult Viewer benchmarks")
+    parser.add_argument("--out", help="write the results as JSON to this file instead of stdout")
+    parser.add_argument("--rounds", type=int, default=20, help="rounds per benchmark (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=100, help="frame rate of the fake source in Hz")
+    parser.add_argument("--duration", type=float, default=3, help="duration of the latency run in s")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    total = len(consult.Definition.get_parameters())
+    counts = sorted({min(total, n) for n in (1, 10, 50, total)})
+
+    results = []
+    results += bench_table_data(counts, args.rounds)
+    results += bench_update_values(counts, args.rounds)
+    results += bench_parameters_changed(counts, args.rounds)
+    results += bench_status_log(max(1, args.rounds // 4))
+    results += bench_frame_to_paint(app, total, args.rate, args.duration)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "python": platform.python_version(), "pyside": PySide6.__version__},
+        "benchmarks": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+# Entrypoint
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from PySide6.QtCore import QObject, Signal, Slot
+
+from acquisition import AcquisitionThread
+from diagnostics import PipelineMonitor
+from parametertable import ParameterTableView, DEFAULT_REFRESH_RATE
+from selection import ParameterSelection
+
+
+class EcuConnection(QObject):
+    '''
+    A further Consult interface next to the main one, e.g. another car on the test
+    bench. It has its own acquisition thread, parameter selection, parameter table
+    and pipeline monitor; its table refreshes on the main window's shared ticker.
+    '''
+    linkStatusChanged = Signal(str, bool, str)  # connection name, connected, message
+
+    def __init__(self, port: str, ticker, refresh_rate=DEFAULT_REFRESH_RATE, parent=None):
+        super().__init__(parent)
+        self.name = port
+        self.selection = ParameterSelection(self, mirror_definition=False)
+        self.table_view = ParameterTableView(None, refresh_rate, ticker, self.selection)
+        self.monitor = PipelineMonitor(self)
+        self.acquisition = AcquisitionThread(port, self)
+
+        self.selection.selectionChanged.connect(self._selection_changed)
+        self.selection.targetRatesChanged.connect(self.acquisition.set_target_rates)
+        self.table_view.targetRateChosen.connect(self.selection.set_target_rates)
+        self.acquisition.frameReceived.connect(self.table_view.frame_received)
+        self.acquisition.frameReceived.connect(self.monitor.frame_received)
+        self.acquisition.linkStatusChanged.connect(
+            lambda connected, message: self.linkStatusChanged.emit(self.name, connected, message))
+        self.monitor.watch_paints(self.table_view.viewport())
+        self.table_view.valuesChanged.connect(self.monitor.values_changed)
+        self.monitor.add_drop_counter(lambda: self.acquisition.frames_dropped)
+        self.monitor.set_update_counters(self.table_view.update_counters)
+
+    def start(self):
+        self.acquisition.set_parameters(self.selection.enabled_parameters())
+        self.acquisition.start()
+
+    def stop(self):
+        self.acquisition.stop()
+
+    @Slot(list)
+    def _selection_changed(self, changes):
+        if len(changes) == 1:
+            self.table_view.parameter_toggled(*changes[0])
+        else:
+            self.table_view.parameters_changed()
+        self.acquisition.set_parameters(self.selection.enabled_parameters())
@@ -0,0 +1,491 @@
+import logging
+import math
+import threading
+import time
+from typing import Callable, NamedTuple
+
+import serial
+
+#
+# Consult protocol bytes. The ECU is initialized with FF FF EF and answers 10.
+# A stream is requested by sending 5A <register> for every register followed by
+# F0; the ECU then repeats FF <length> <data...> frames until it receives 30.
+#
+BAUD_RATE = 9600
+INIT_SEQUENCE = b"\xFF\xFF\xEF"
+INIT_ACK = 0x10
+CMD_READ_REGISTER = 0x5A
+CMD_STOP = 0x30
+CMD_TERMINATE = 0xF0
+FRAME_START = 0xFF
+
+SLICE_FRAMES = 2  # frames streamed before the scheduler re-evaluates which parameters are due
+DEFAULT_RESTART_COST = 0.03  # s, estimated time lost re-requesting the stream until it is measured
+RESTART_COST_WEIGHT = 0.2  # weight of a new measurement in the running estimate
+KEEP_PERIODS = 10  # parameters due more often than every KEEP_PERIODS restart costs stay in every frame
+BATCH_LEAD = 0.25  # fraction of its period a parameter is sampled early to share a re-request
+RECONNECT_DELAY = 0.5  # s before the first reconnect attempt, doubled after every failed one
+MAX_RECONNECT_DELAY = 30.0  # s
+LINK_TIMEOUT = 2.0  # s without a frame before a streaming link is considered lost
+PARSER_COUNTERS = ("frames_discarded", "bytes_discarded", "desyncs")
+
+
+class ConsultError(Exception):
+    pass
+
+
+class Frame(NamedTuple):
+    timestamp_ns: int  # time.monotonic_ns() when the frame was received
+    param_ids: tuple
+    payload: bytes
+    values: tuple
+    # every parameter the stream currently serves; a multiplexed frame carries only some of them
+    stream_ids: tuple = ()
+
+
+class StreamLayout:
+    '''
+    Byte layout of one batched stream request. Parameters from consult.Definition
+    describe their ECU registers (MSB first) and the linear scaling from the raw
+    register value to engineering units.
+    '''
+    def __init__(self, params):
+        self.params = list(params)
+        self.param_ids = tuple(p.id for p in self.params)
+        self.registers = []
+        self._fields = []
+        for param in self.params:
+            self._fields.append((len(self.registers), len(param.registers), param.scale, param.offset))
+            self.registers.extend(param.registers)
+        self.frame_length = len(self.registers)
+
+    def request_bytes(self) -> bytes:
+        request = bytearray()
+        for register in self.registers:
+            request.append(CMD_READ_REGISTER)
+            request.append(register)
+        request.append(CMD_TERMINATE)
+        return bytes(request)
+
+    def decode(self, payload: bytes) -> tuple:
+        return tuple(int.from_bytes(payload[start:start + size], "big") * scale + offset
+                     for start, size, scale, offset in self._fields)
+
+
+class StreamScheduler:
+    '''
+    Multiplexes the enabled parameters over the link. Parameters without a target
+    rate are part of every frame. Parameters with a target rate (in Hz) are only
+    added to the stream while they are due, so they cost link bandwidth for one
+    frame per period instead of lengthening every frame and slowing down the
+    others. Without any target rates the stream never changes.
+
+    Every sample of a multiplexed parameter costs two re-requests of the stream,
+    during which no frames arrive. The poller measures that restart cost, and a
+    parameter due more often than every KEEP_PERIODS restart costs is kept in every
+    frame instead, so multiplexing one never takes more than a small share of the
+    link. Parameters due within BATCH_LEAD of their period are sampled together
+    with one that is due, sharing its re-requests.
+    '''
+    def __init__(self, params, target_rates=None):
+        target_rates = target_rates or {}
+        self.params = list(params)
+        self._periods = {p.id: 1.0 / target_rates[p.id] for p in self.params if target_rates.get(p.id)}
+        self._last_sampled = dict.fromkeys(self._periods, -math.inf)
+        self._layouts = {}
+        self.restart_cost = DEFAULT_RESTART_COST
+
+    @property
+    def multiplexed(self) -> bool:
+        return bool(self._periods)
+
+    def _layout(self, params) -> StreamLayout:
+        param_ids = tuple(p.id for p in params)
+        layout = self._layouts.get(param_ids)
+        if layout is None:
+            layout = self._layouts[param_ids] = StreamLayout(params)
+        return layout
+
+    def _kept(self, period: float) -> bool:
+        return period < KEEP_PERIODS * self.restart_cost
+
+    def layout_at(self, now: float) -> StreamLayout:
+        periods, last_sampled = self._periods, self._last_sampled
+        due = [p.id for p in self.params if p.id in periods and not self._kept(periods[p.id])
+               and now - last_sampled[p.id] >= periods[p.id]]
+        if due:
+            # parameters soon due as well are sampled now, rather than re-requesting the stream again for them
+            due += [p.id for p in self.params if p.id in periods and p.id not in due and not self._kept(periods[p.id])
+                    and now - last_sampled[p.id] >= (1.0 - BATCH_LEAD) * periods[p.id]]
+        return self._layout([p for p in self.params
+                             if p.id not in periods or self._kept(periods[p.id]) or p.id in due])
+
+    def next_due(self, now: float) -> float:
+        # seconds until the next parameter with a target rate is due
+        if not self._periods:
+            return math.inf
+        return max(0.0, min(self._last_sampled[i] + period for i, period in self._periods.items()) - now)
+
+    def restarted(self, seconds: float):
+        '''
+        Records how long a re-request of the stream took until its first frame.
+        '''
+        self.restart_cost += RESTART_COST_WEIGHT * (seconds - self.restart_cost)
+
+    def sampled(self, layout: StreamLayout, now: float) -> bool:
+        '''
+        Records a frame of the layout and returns whether it carried a multiplexed
+        parameter, which then is not due again before its next period.
+        '''
+        periods, last_sampled = self._periods, self._last_sampled
+        carried = False
+        for param_id in layout.param_ids:
+            if param_id in periods and not self._kept(periods[param_id]):
+                carried = True
+                due = last_sampled[param_id] + periods[param_id]
+                if now < due - BATCH_LEAD * periods[param_id]:
+                    continue  # a second frame of the same period
+                # the next period starts where this one was due, so a late or early sample does not change the rate
+                last_sampled[param_id] = due if abs(now - due) < periods[param_id] else now
+        return carried
+
+
+class FrameParser:
+    '''
+    Splits the raw byte stream into frame payloads of the expected length. A frame
+    is only accepted once the start byte of the next frame follows it, so a frame
+    that lost or gained a byte is not mistaken for a valid one. That holds each
+    frame back until the next one starts, about a millisecond at 9600 baud.
+
+    When the stream falls out of sync the parser skips bytes up to the next
+    confirmed frame boundary, without restarting the stream. Every such gap counts
+    as one desync and one discarded frame. flush() ends the stream, accepting the
+    last frame that no further frame can confirm.
+    '''
+    def __init__(self, frame_length: int):
+        self._frame_length = frame_length
+        self._buffer = bytearray()
+        self._synced = False
+        self._skipping = False
+        self.frames_discarded = 0
+        self.bytes_discarded = 0
+        self.desyncs = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        buf = self._buffer
+        buf += data
+        payloads = []
+        length = self._frame_length
+        pos = 0
+        while True:
+            start = buf.find(FRAME_START, pos)
+            if start < 0:
+                self._skip(len(buf) - pos)
+                pos = len(buf)
+                break
+            self._skip(start - pos)
+            end = start + 2 + length
+            if end >= len(buf):
+                pos = start  # wait for the rest of the frame and the start of the next one
+                break
+            if buf[start + 1] != length or buf[end] != FRAME_START:
+                self._skip(1)
+                pos = start + 1
+                continue
+            payloads.append(bytes(buf[start + 2:end]))
+            self._synced = True
+            self._skipping = False
+            pos = end
+        del buf[:pos]
+        return payloads
+
+    def flush(self) -> list[bytes]:
+        '''
+        Returns the held back last frame once the stream has stopped, if it is complete
+        and its length byte matches. A complete frame that does not match is counted
+        as discarded; a frame cut off by the stop request is not.
+        '''
+        buf = self._buffer
+        length = self._frame_length
+        payloads = []
+        if len(buf) >= 2 + length:
+            if buf[1] == length:
+                payloads.append(bytes(buf[2:2 + length]))
+            elif self._synced:
+                self.bytes_discarded += len(buf)
+                self.frames_discarded += 1
+        buf.clear()
+        return payloads
+
+    def _skip(self, count: int):
+        # bytes before the first valid frame are the echo of the stream request, not a desync
+        if count <= 0 or not self._synced:
+            return
+        self.bytes_discarded += count
+        if not self._skipping:
+            self._skipping = True
+            self.desyncs += 1
+            self.frames_discarded += 1
+
+
+class ConsultSession:
+    '''
+    A serial session with the ECU. The port may be any pyserial URL, e.g. a device
+    path such as /dev/ttyUSB0 or socket://host:port.
+    '''
+    def __init__(self, port_url: str, timeout: float = 0.5):
+        self._port_url = port_url
+        self._timeout = timeout
+        self._port = None
+        self._parser = None
+        self._counters = dict.fromkeys(PARSER_COUNTERS, 0)  # of the parsers of finished streams
+
+    @property
+    def port_url(self):
+        return self._port_url
+
+    def counter(self, name: str) -> int:
+        '''
+        Returns one of the PARSER_COUNTERS summed over all streams of this session.
+        '''
+        return self._counters[name] + (getattr(self._parser, name) if self._parser is not None else 0)
+
+    @property
+    def frames_discarded(self):
+        return self.counter("frames_discarded")
+
+    def open(self):
+        try:
+            self._port = serial.serial_for_url(self._port_url, baudrate=BAUD_RATE, timeout=self._timeout)
+        except serial.SerialException as e:
+            raise ConsultError(f"Unable to open '{self._port_url}': {e}") from e
+        self.initialize()
+
+    def close(self):
+        self._retire_parser()
+        if self._port is not None:
+            try:
+                self._port.close()
+            except (serial.SerialException, OSError):
+                pass  # the adapter is already gone
+            self._port = None
+
+    def initialize(self):
+        try:
+            self._port.reset_input_buffer()
+            self._port.write(INIT_SEQUENCE)
+            ack = self._port.read(1)
+        except (serial.SerialException, OSError) as e:
+            raise ConsultError(f"Lost connection on '{self._port_url}': {e}") from e
+        if ack != bytes((INIT_ACK,)):
+            raise ConsultError(f"ECU did not acknowledge initialization (got {ack.hex() or 'nothing'})")
+
+    def start_stream(self, layout: StreamLayout):
+        self._write(layout.request_bytes())
+        self._parser = FrameParser(layout.frame_length)
+
+    def stop_stream(self) -> list[bytes]:
+        '''
+        Stops the stream and returns the payload of its last frame, which the parser
+        held back waiting for a next frame that will not come.
+        '''
+        self._write(bytes((CMD_STOP,)))
+        try:
+            self._port.reset_input_buffer()
+        except (serial.SerialException, OSError) as e:
+            raise ConsultError(f"Lost connection on '{self._port_url}': {e}") from e
+        payloads = self._parser.flush() if self._parser is not None else []
+        self._retire_parser()
+        return payloads
+
+    def read_payloads(self) -> list[bytes]:
+        try:
+            data = self._port.read(max(1, self._port.in_waiting))
+        except (serial.SerialException, OSError) as e:
+            raise ConsultError(f"Lost connection on '{self._port_url}': {e}") from e
+        if self._parser is None:
+            return []
+        return self._parser.feed(data)
+
+    def _write(self, data: bytes):
+        try:
+            self._port.write(data)
+        except (serial.SerialException, OSError) as e:
+            raise ConsultError(f"Lost connection on '{self._port_url}': {e}") from e
+
+    def _retire_parser(self):
+        if self._parser is not None:
+            # a frame still held back when the session is closed is lost with it
+            if self._parser.flush():
+                self._parser.frames_discarded += 1
+            for name in PARSER_COUNTERS:
+                self._counters[name] += getattr(self._parser, name)
+        self._parser = None
+
+
+class StreamPoller:
+    '''
+    Polls the enabled parameters as batched stream requests, re-requesting the stream
+    whenever the StreamScheduler changes the set of due parameters, and hands decoded
+    frames to the registered sinks. run() blocks on serial I/O, so it is meant to
+    be the body of a dedicated acquisition thread; sinks are called on that thread.
+
+    If the port cannot be opened, fails, or goes silent while streaming, the session
+    is closed and reopened with exponential backoff until stop() is called. The
+    optional status callable is told about every change as (connected, message).
+    '''
+    def __init__(self, session: ConsultSession, status: Callable[[bool, str], None] = None):
+        self._session = session
+        self._status = status
+        self._sinks = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._params = []
+        self._target_rates = {}
+        self._scheduler = None
+        self._scheduler_changed = False
+        self._stop_requested = False
+        self.reconnects = 0
+
+    @property
+    def frames_discarded(self):
+        return self._session.frames_discarded
+
+    @property
+    def desyncs(self):
+        return self._session.counter("desyncs")
+
+    def add_sink(self, sink: Callable[[Frame], None]):
+        # sinks are replaced rather than mutated so run() can iterate them without locking
+        self._sinks = self._sinks + [sink]
+
+    def remove_sink(self, sink: Callable[[Frame], None]):
+        self._sinks = [s for s in self._sinks if s != sink]
+
+    def set_parameters(self, params):
+        with self._lock:
+            self._params = list(params)
+            self._scheduler = StreamScheduler(self._params, self._target_rates)
+            self._scheduler_changed = True
+        self._wake.set()
+
+    def set_target_rates(self, target_rates: dict):
+        '''
+        Sets the target rate in Hz by parameter id. Parameters without one are streamed
+        as fast as the link allows.
+        '''
+        with self._lock:
+            self._target_rates = dict(target_rates)
+            self._scheduler = StreamScheduler(self._params, self._target_rates)
+            self._scheduler_changed = True
+        self._wake.set()
+
+    def stop(self):
+        self._stop_requested = True
+        self._wake.set()
+
+    def _idle(self, timeout):
+        self._wake.wait(timeout)
+        self._wake.clear()
+
+    def _report(self, connected: bool, message: str):
+        if self._status is not None:
+            self._status(connected, message)
+
+    def run(self):
+        session = self._session
+        delay = RECONNECT_DELAY
+        while not self._stop_requested:
+            try:
+                session.open()
+            except ConsultError as e:
+                session.close()
+                logging.warning(f"{e}, retrying in {delay:.1f} s")
+                self._report(False, f"{e}, retrying in {delay:.1f} s")
+                self._idle(delay)
+                delay = min(2 * delay, MAX_RECONNECT_DELAY)
+                continue
+
+            logging.info(f"Connected to ECU on '{session.port_url}'")
+            self._report(True, f"Connected to ECU on '{session.port_url}'")
+            delay = RECONNECT_DELAY
+            try:
+                self._stream()
+            except ConsultError as e:
+                self.reconnects += 1
+                logging.warning(f"{e}, reconnecting")
+                self._report(False, f"{e}, reconnecting")
+            finally:
+                session.close()
+        logging.info(f"Disconnected from ECU on '{session.port_url}'")
+        self._report(False, f"Disconnected from ECU on '{session.port_url}'")
+
+    def _stream(self):
+        session = self._session
+        with self._lock:
+            scheduler = self._scheduler
+            self._scheduler_changed = False
+        stream_ids = tuple(p.id for p in scheduler.params) if scheduler is not None else ()
+        layout = None
+        slice_frames = SLICE_FRAMES
+        last_frame = time.monotonic()
+        restart_start = None  # when the stream was last re-requested, until its first frame
+        while not self._stop_requested:
+            with self._lock:
+                if self._scheduler_changed:
+                    scheduler = self._scheduler
+                    self._scheduler_changed = False
+                    stream_ids = tuple(p.id for p in scheduler.params)
+                    slice_frames = SLICE_FRAMES
+
+            # the stream is only re-requested when the set of due parameters changed
+            if scheduler is not None and slice_frames >= SLICE_FRAMES:
+                slice_frames = 0
+                next_layout = scheduler.layout_at(time.monotonic())
+                if next_layout.frame_length == 0:
+                    next_layout = None
+                if layout is None or next_layout is None or next_layout.param_ids != layout.param_ids:
+                    restart_start = None
+                    if layout is not None:
+                        restart_start = time.monotonic()
+                        self._deliver(layout, session.stop_stream(), stream_ids)
+                    layout = next_layout
+                    if layout is not None:
+                        session.start_stream(layout)
+                        last_frame = time.monotonic()
+                if not scheduler.multiplexed:
+                    scheduler = None
+
+            if layout is None:
+                due = scheduler.next_due(time.monotonic()) if scheduler is not None else math.inf
+                self._idle(min(due, 0.1))
+                slice_frames = SLICE_FRAMES
+                continue
+
+            payloads = session.read_payloads()
+            if not payloads:
+                if time.monotonic() - last_frame > LINK_TIMEOUT:
+                    raise ConsultError(f"No frames from '{session.port_url}' for {LINK_TIMEOUT:.0f} s")
+                continue
+            now = time.monotonic_ns()
+            last_frame = now / 1e9
+            self._deliver(layout, payloads, stream_ids, now)
+            if scheduler is not None:
+                if restart_start is not None:
+                    scheduler.restarted(last_frame - restart_start)
+                    restart_start = None
+                slice_frames += len(payloads)
+                # due parameters are sampled once per period, then the layout is re-evaluated
+                if scheduler.sampled(layout, now / 1e9):
+                    slice_frames = SLICE_FRAMES
+
+        if layout is not None:
+            self._deliver(layout, session.stop_stream(), stream_ids)
+
+    def _deliver(self, layout: StreamLayout, payloads: list[bytes], stream_ids: tuple, now: int = None):
+        if now is None:
+            now = time.monotonic_ns()
+        for payload in payloads:
+            frame = Frame(now, layout.param_ids, payload, layout.decode(payload), stream_ids)
+            for sink in self._sinks:
+                sink(frame)
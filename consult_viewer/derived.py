@@ -0,0 +1,184 @@
+import ast
+import json
+import math
+import re
+
+DERIVED_ID_PREFIX = "derived:"
+
+#
+# Derived channels are computed from the values of consult.Definition parameters.
+# Each is written on one line as
+#
+#   NAME [UNIT] = EXPRESSION
+#
+# with the parameters referenced by name in braces, e.g.
+#
+#   AFR [AFR] = {Left O2 Sensor} * 2 + 10
+#   Injector Duty [%] = {Injector Pulse Width} * {Engine Speed} / 1200
+#   Boost [kPa] = max({MAP Voltage} * 50 - 101.3, 0)
+#
+# An expression is checked and compiled once into a function of the referenced
+# values. It may only use numbers, arithmetic, single comparisons and FUNCTIONS,
+# which exist for plain floats and for NumPy arrays, so the same compiled code
+# evaluates one frame in the live table and whole chunks in replay and export, with
+# the same result for nan inputs. Results that are not finite or not real (division
+# by zero, log or fractional power of a negative value, ...) are nan.
+#
+FUNCTIONS = {"abs": 1, "min": 2, "max": 2, "sqrt": 1, "exp": 1, "log": 1, "clip": 3, "where": 3}  # name: arguments
+
+_DEFINITION = re.compile(r"^\s*(?P<name>[^\[\]={}]+?)\s*(?:\[(?P<unit>[^\]]*)\])?\s*=\s*(?P<expression>.+?)\s*$")
+_REFERENCE = re.compile(r"\{([^{}]+)\}")
+_ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Constant, ast.Load,
+                  ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+                  ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+def _minimum(a, b):
+    # like np.minimum, a nan input gives nan whichever side it is on
+    return a if a < b or a != a else b
+
+
+def _maximum(a, b):
+    return a if a > b or a != a else b
+
+
+_SCALAR_FUNCTIONS = {
+    "abs": abs,
+    "min": _minimum,
+    "max": _maximum,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "clip": lambda value, low, high: _minimum(_maximum(value, low), high),
+    "where": lambda condition, a, b: a if condition else b,
+}
+_array_functions = None
+
+
+def array_functions() -> dict:
+    # NumPy is only needed, and imported, once channels are evaluated over arrays
+    global _array_functions
+    if _array_functions is None:
+        import numpy as np
+        _array_functions = {"abs": np.abs, "min": np.minimum, "max": np.maximum, "sqrt": np.sqrt, "exp": np.exp,
+                            "log": np.log, "clip": np.clip, "where": np.where}
+    return _array_functions
+
+
+class ExpressionError(Exception):
+    pass
+
+
+class DerivedChannel:
+    '''
+    A computed parameter. It has the id, name and unit_label of a parameter so it
+    can stand in for one in the parameter table; input_ids are the ids of the
+    parameters it is computed from, in the order evaluate() takes their values.
+    '''
+    def __init__(self, name: str, unit_label: str, expression: str, params):
+        self.id = DERIVED_ID_PREFIX + name
+        self.name = name
+        self.unit_label = unit_label
+        self.expression = expression
+
+        by_name = {param.name.lower(): param for param in params}
+        input_ids = []
+
+        def substitute(match):
+            param = by_name.get(match.group(1).strip().lower())
+            if param is None:
+                raise ExpressionError(f"'{name}': unknown parameter '{match.group(1).strip()}'")
+            if param.id not in input_ids:
+                input_ids.append(param.id)
+            return f"_{input_ids.index(param.id)}"
+        source = _REFERENCE.sub(substitute, expression)
+        if not input_ids:
+            raise ExpressionError(f"'{name}': the expression does not reference any parameter")
+        self.input_ids = tuple(input_ids)
+
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError(f"'{name}': invalid expression '{expression}'") from e
+        arguments = [f"_{i}" for i in range(len(input_ids))]
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ExpressionError(f"'{name}': '{ast.unparse(node)}' is not allowed in an expression")
+            if isinstance(node, ast.Name) and node.id not in arguments and node.id not in FUNCTIONS:
+                raise ExpressionError(f"'{name}': unknown name '{node.id}', parameters are referenced in braces")
+            if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS
+                                               or node.keywords):
+                raise ExpressionError(f"'{name}': unknown function '{ast.unparse(node.func)}'")
+            if isinstance(node, ast.Call) and len(node.args) != FUNCTIONS[node.func.id]:
+                raise ExpressionError(f"'{name}': {node.func.id}() takes {FUNCTIONS[node.func.id]} "
+                                      f"argument{'s' if FUNCTIONS[node.func.id] > 1 else ''}, "
+                                      f"got {len(node.args)}")
+            if isinstance(node, ast.Compare) and len(node.ops) > 1:
+                raise ExpressionError(f"'{name}': chained comparisons are not supported")
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ExpressionError(f"'{name}': only numbers are allowed as constants")
+
+        self._code = compile(f"lambda {', '.join(arguments)}: {source}", f"<derived channel {name}>", "eval")
+        self._scalar = eval(self._code, {"__builtins__": {}, **_SCALAR_FUNCTIONS})
+        self._array = None
+
+    @property
+    def definition(self) -> str:
+        unit = f" [{self.unit_label}]" if self.unit_label else ""
+        return f"{self.name}{unit} = {self.expression}"
+
+    def evaluate(self, *values) -> float:
+        try:
+            result = float(self._scalar(*values))
+        except (ArithmeticError, ValueError, TypeError):  # TypeError for the complex power of a negative value
+            return math.nan
+        return result if math.isfinite(result) else math.nan
+
+    def evaluate_array(self, *columns):
+        '''
+        Evaluates the channel over NumPy arrays of the input values, one element per frame.
+        '''
+        import numpy as np
+        if self._array is None:
+            self._array = eval(self._code, {"__builtins__": {}, **array_functions()})
+        with np.errstate(all="ignore"):
+            result = np.asarray(self._array(*columns), dtype=np.float64)
+        return np.where(np.isfinite(result), result, np.nan)
+
+
+def parse_channel(definition: str, params) -> DerivedChannel:
+    match = _DEFINITION.match(definition)
+    if match is None:
+        raise ExpressionError(f"'{definition}' is not of the form NAME [UNIT] = EXPRESSION")
+    return DerivedChannel(match.group("name"), match.group("unit") or "", match.group("expression"), params)
+
+
+def parse_channels(definitions, params) -> list:
+    '''
+    Compiles a list of definitions, skipping blank lines. Raises ExpressionError for
+    the first invalid or duplicate one.
+    '''
+    channels = []
+    for definition in definitions:
+        if not definition.strip():
+            continue
+        channel = parse_channel(definition, params)
+        if any(other.name == channel.name for other in channels):
+            raise ExpressionError(f"'{channel.name}' is defined twice")
+        channels.append(channel)
+    return channels
+
+
+class DerivedChannelStore:
+    '''
+    The definitions of the derived channels, saved in the settings file.
+    '''
+    KEY = "derived/channels"
+
+    def __init__(self, settings):
+        self._settings = settings
+
+    def definitions(self) -> list:
+        return json.loads(self._settings.value(self.KEY, "[]"))
+
+    def save(self, channels):
+        self._settings.setValue(self.KEY, json.dumps([channel.definition for channel in channels]))
@@ -0,0 +1,206 @@
+import time
+from array import array
+
+from PySide6.QtCore import QObject, QEvent, QTimer, Signal, Slot
+from PySide6.QtWidgets import QWidget, QGridLayout, QLabel
+from dockutils import DockableView
+
+LATENCY_WINDOW = 1000  # samples kept for the rolling percentiles
+REPORT_INTERVAL = 500  # ms
+LAG_PROBE_INTERVAL = 50  # ms
+
+#
+# Every frame carries the monotonic timestamp of its receipt from the ECU. The
+# monitor measures the time from receipt until the table model has taken the frame
+# (the monitor's slot is connected after the table's, so it runs right after
+# update_values) and, for frames that changed a displayed value, until the next
+# paint of the table viewport. Event loop lag is how late a short periodic timer
+# fires.
+#
+
+
+class RollingLatency:
+    '''
+    Ring buffer of the most recent latency samples in seconds.
+    '''
+    def __init__(self, capacity: int = LATENCY_WINDOW):
+        self._samples = array('d', [0.0]) * capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, seconds: float):
+        self._samples[self._next] = seconds
+        self._next = (self._next + 1) % len(self._samples)
+        self._count = min(self._count + 1, len(self._samples))
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def percentiles(self, *ps):
+        if not self._count:
+            return tuple(None for _ in ps)
+        ordered = sorted(self._samples[:self._count])
+        return tuple(ordered[min(self._count - 1, int(self._count * p))] for p in ps)
+
+
+class PipelineMonitor(QObject):
+    '''
+    Collects frame-to-pixel latency, frame rate, dropped frames, how the table
+    model coalesced its updates and event loop lag, and reports them with
+    statsUpdated a few times per second.
+    '''
+    statsUpdated = Signal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._model_latency = RollingLatency()
+        self._paint_latency = RollingLatency()
+        self._loop_lag = RollingLatency(LATENCY_WINDOW // 10)
+        self._unpainted_ns = None
+        self._frames = 0
+        self._drop_counters = []
+        self._update_counters = None
+        self._report_start_ns = time.monotonic_ns()
+
+        self._lag_timer = QTimer(self)
+        self._lag_timer.setInterval(LAG_PROBE_INTERVAL)
+        self._lag_timer.timeout.connect(self._probe_loop_lag)
+        self._last_probe_ns = time.monotonic_ns()
+        self._lag_timer.start()
+
+        self._report_timer = QTimer(self)
+        self._report_timer.setInterval(REPORT_INTERVAL)
+        self._report_timer.timeout.connect(self._report)
+        self._report_timer.start()
+
+    def watch_paints(self, widget: QWidget):
+        widget.installEventFilter(self)
+
+    def add_drop_counter(self, counter):
+        '''
+        Registers a callable returning a cumulative count of frames lost on the way in.
+        '''
+        self._drop_counters.append(counter)
+
+    def remove_drop_counter(self, counter):
+        self._drop_counters = [c for c in self._drop_counters if c != counter]
+
+    def set_update_counters(self, counters):
+        '''
+        Registers a callable returning the cumulative update counters of the table model,
+        see ConsultParameterTableModel.update_counters().
+        '''
+        self._update_counters = counters
+
+    def reset(self):
+        self._model_latency.clear()
+        self._paint_latency.clear()
+        self._loop_lag.clear()
+        self._unpainted_ns = None
+
+    @Slot(object)
+    def frame_received(self, frame):
+        self._model_latency.add((time.monotonic_ns() - frame.timestamp_ns) / 1e9)
+        self._frames += 1
+
+    @Slot(object)
+    def values_changed(self, frame):
+        # a frame that left every value as it was has nothing to paint
+        if self._unpainted_ns is None:
+            self._unpainted_ns = frame.timestamp_ns
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint and self._unpainted_ns is not None:
+            self._paint_latency.add((time.monotonic_ns() - self._unpainted_ns) / 1e9)
+            self._unpainted_ns = None
+        return False
+
+    @Slot()
+    def _probe_loop_lag(self):
+        now = time.monotonic_ns()
+        self._loop_lag.add(max(0.0, (now - self._last_probe_ns) / 1e9 - LAG_PROBE_INTERVAL / 1000))
+        self._last_probe_ns = now
+
+    @Slot()
+    def _report(self):
+        now = time.monotonic_ns()
+        elapsed = (now - self._report_start_ns) / 1e9
+        model_p50, model_p99 = self._model_latency.percentiles(0.5, 0.99)
+        paint_p50, paint_p99 = self._paint_latency.percentiles(0.5, 0.99)
+        lag_p50, lag_max = self._loop_lag.percentiles(0.5, 1.0)
+        updates = self._update_counters() if self._update_counters is not None else {}
+        self.statsUpdated.emit({
+            "frames_per_second": self._frames / elapsed if elapsed > 0 else 0.0,
+            "frames_dropped": sum(counter() for counter in self._drop_counters),
+            "updates_unchanged": updates.get("unchanged", 0),
+            "updates_merged": updates.get("merged", 0),
+            "updates_dropped": updates.get("dropped", 0),
+            "model_latency_p50": model_p50,
+            "model_latency_p99": model_p99,
+            "paint_latency_p50": paint_p50,
+            "paint_latency_p99": paint_p99,
+            "loop_lag_p50": lag_p50,
+            "loop_lag_max": lag_max,
+        })
+        self._frames = 0
+        self._report_start_ns = now
+
+
+def format_ms(seconds) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+class DiagnosticsView(QWidget, DockableView):
+    '''
+    Shows the latest statistics of every connection side by side, one column each.
+    '''
+    FIELDS = (("frames_per_second", "Frames/s", lambda v: f"{v:.1f}"),
+              ("frames_dropped", "Dropped frames", str),
+              ("updates_unchanged", "Unchanged updates", str),
+              ("updates_merged", "Merged updates", str),
+              ("updates_dropped", "Dropped updates", str),
+              ("model_latency_p50", "Receipt to model p50", format_ms),
+              ("model_latency_p99", "Receipt to model p99", format_ms),
+              ("paint_latency_p50", "Receipt to paint p50", format_ms),
+              ("paint_latency_p99", "Receipt to paint p99", format_ms),
+              ("loop_lag_p50", "Event loop lag p50", format_ms),
+              ("loop_lag_max", "Event loop lag max", format_ms))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._layout = QGridLayout(self)
+        for row, (_, title, _) in enumerate(self.FIELDS, start=1):
+            self._layout.addWidget(QLabel(title), row, 0)
+        self._columns = {}  # connection name -> labels, header first
+
+    def initial_expanded_size(self) -> int:
+        return 220
+
+    def _labels_for(self, name):
+        labels = self._columns.get(name)
+        if labels is None:
+            column = self._layout.columnCount()
+            labels = self._columns[name] = [QLabel(f"<b>{name}</b>")] + [QLabel("-") for _ in self.FIELDS]
+            for row, label in enumerate(labels):
+                self._layout.addWidget(label, row, column)
+        return labels
+
+    def set_stats(self, name, stats):
+        labels = self._labels_for(name)
+        for label, (key, _, format_value) in zip(labels[1:], self.FIELDS):
+            label.setText(format_value(stats[key]))
+
+    def remove_connection(self, name):
+        for label in self._columns.pop(name, []):
+            self._layout.removeWidget(label)
+            label.deleteLater()
+
+
+def format_status(stats) -> str:
+    return (f"{stats['frames_per_second']:.0f} frames/s | paint p50 {format_ms(stats['paint_latency_p50'])}"
+            f" p99 {format_ms(stats['paint_latency_p99'])} | dropped {stats['frames_dropped']}"
+            f" | lag {format_ms(stats['loop_lag_max'])}")
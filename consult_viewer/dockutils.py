@@ -1,4 +1,7 @@
+import logging
+import time
 from abc import ABC, ABCMeta, abstractmethod
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QWidget
 from PySide6.QtWidgets import QSizePolicy
 import PySide6QtAds as QtAds
@@ -15,6 +18,24 @@ class DockableView(ABC, metaclass=QABCMeta):
         pass
 
 
+class PlaceholderView(QWidget, DockableView):
+    '''
+    Stands in for a view that has not been created yet and calls shown when it first
+    becomes visible.
+    '''
+    def __init__(self, shown: Callable[[], None], parent=None):
+        super().__init__(parent)
+        self._shown = shown
+
+    def initial_expanded_size(self) -> int:
+        return 0
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # the real view replaces this one, which must not happen while Qt is still showing it
+        QTimer.singleShot(0, self._shown)
+
+
 def create_and_dock_view(parent: QWidget,
                          dockmgr: QtAds.CDockManager,
                          title: str,
@@ -34,3 +55,35 @@ def create_and_dock_view(parent: QWidget,
         container.setSize(view.initial_expanded_size())
         container.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
     return dock, container
+
+
+def create_and_dock_lazy_view(parent: QWidget,
+                              dockmgr: QtAds.CDockManager,
+                              title: str,
+                              area: QtAds.DockWidgetArea | QtAds.ads.SideBarLocation,
+                              factory: Callable[[], QWidget],
+                              created: Callable[[QWidget], None] = None) -> (
+        QtAds.CDockWidget,
+        QtAds.CDockContainerWidget):
+    '''
+    Like create_and_dock_view, but the view is only built by factory when the dock is
+    shown for the first time, e.g. when an auto-hide dock is first expanded. The
+    created callback receives the view once it exists.
+    '''
+    def build_view():
+        if dock.widget() is not placeholder:
+            return
+        start = time.perf_counter()
+        view = factory()
+        dock.takeWidget()
+        placeholder.deleteLater()
+        dock.setWidget(view)
+        if dock.isAutoHide():
+            dock.autoHideDockContainer().setSize(view.initial_expanded_size())
+        if created is not None:
+            created(view)
+        logging.debug(f"Created the '{title}' view in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    placeholder = PlaceholderView(build_view)
+    dock, container = create_and_dock_view(parent, dockmgr, title, area, placeholder)
+    return dock, container
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from derived import parse_channels, ExpressionError
+from sessionfile import SessionReader, SessionFormatError
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+EXPORT_FILE_FILTER = "CSV files (*.csv);;Parquet files (*.parquet);;Arrow files (*.arrow)"
+ROW_GROUP_ROWS = 128 * 1024  # rows buffered into one Parquet row group or Arrow record batch
+
+#
+# Sessions are exported one chunk at a time, so memory use does not depend on the
+# length of the recording. Each chunk is viewed as a NumPy structured array of
+# (timestamp, payload bytes) records and every parameter is converted to
+# engineering units with a few array operations over the whole chunk. Values the
+# record's presence mask marks absent are NaN. The derived channels recorded in the
+# session header are then evaluated over those columns.
+#
+
+
+class ExportError(Exception):
+    pass
+
+
+def format_for_path(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension == "feather":
+        return "arrow"
+    if extension not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown export format '{extension}', expected one of {', '.join(EXPORT_FORMATS)}")
+    return extension
+
+
+def column_names(reader: SessionReader, derived=()) -> list:
+    return ["time_s"] + [f"{p.name} [{p.unit_label}]" if p.unit_label else p.name
+                         for p in list(reader.parameters) + list(derived)]
+
+
+def recorded_channels(reader: SessionReader) -> list:
+    '''
+    Compiles the derived channels saved with the session.
+    '''
+    try:
+        return parse_channels(reader.derived_definitions, reader.parameters)
+    except ExpressionError as e:
+        raise SessionFormatError(f"'{reader.path}' has an invalid derived channel: {e}") from e
+
+
+def convert_chunk(reader: SessionReader, chunk: int, derived=()) -> list:
+    '''
+    Returns the columns of a chunk as arrays: seconds from the start of the session,
+    then the value of every recorded parameter in engineering units, then the value
+    of every derived channel.
+    '''
+    fields = [("timestamp", "<i8"), ("payload", "u1", (reader.frame_length,)),
+              ("presence", "u1", (reader.presence_length,))]
+    records = np.frombuffer(reader.chunk_records(chunk), dtype=np.dtype(fields))
+    payload = records["payload"]
+
+    columns = [(records["timestamp"] - reader.start_ns) / 1e9]
+    start = 0
+    for index, param in enumerate(reader.parameters):
+        size = len(param.registers)
+        raw = np.zeros(len(records), dtype=np.uint64)
+        for byte in range(start, start + size):  # registers are MSB first
+            raw = (raw << np.uint64(8)) | payload[:, byte]
+        present = (records["presence"][:, index >> 3] >> (index & 7)) & 1
+        columns.append(np.where(present == 1, raw * param.scale + param.offset, np.nan))
+        start += size
+
+    by_id = {param.id: column for param, column in zip(reader.parameters, columns[1:])}
+    for channel in derived:
+        columns.append(channel.evaluate_array(*(by_id[input_id] for input_id in channel.input_ids)))
+    return columns
+
+
+class CsvWriter:
+    def __init__(self, path, names):
+        self._file = open(path, "w", newline="")
+        csv.writer(self._file).writerow(names)
+
+    def write(self, columns):
+        np.savetxt(self._file, np.column_stack(columns), delimiter=",", fmt="%.9g")
+
+    def close(self):
+        self._file.close()
+
+
+class ArrowWriter:
+    '''
+    Writes Parquet or Arrow IPC files. pyarrow is optional and only imported here.
+    Chunks are buffered up to ROW_GROUP_ROWS rows, so a long session is not split
+    into thousands of tiny row groups.
+    '''
+    def __init__(self, path, names, file_format):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ExportError(f"Exporting to {file_format} requires pyarrow, install it with "
+                              f"'pip install pyarrow'") from e
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.float64()) for name in names])
+        if file_format == "parquet":
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self._schema)
+        self._buffered = []  # column lists of the chunks not written yet
+        self._buffered_rows = 0
+
+    def write(self, columns):
+        self._buffered.append(columns)
+        self._buffered_rows += len(columns[0])
+        if self._buffered_rows >= ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffered_rows:
+            return
+        columns = [np.concatenate(chunks) for chunks in zip(*self._buffered)]
+        self._writer.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+        self._buffered = []
+        self._buffered_rows = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def export_session(session_path: str, out_path: str, file_format: str = None, progress=None) -> int:
+    '''
+    Converts a recorded session to CSV, Parquet or Arrow, chosen by file_format or
+    the extension of out_path. progress is called with (chunks done, chunk count)
+    after every chunk and may return False to cancel. Returns the number of frames
+    exported.
+    '''
+    file_format = file_format or format_for_path(out_path)
+    reader = SessionReader(session_path)
+    try:
+        derived = recorded_channels(reader)
+        names = column_names(reader, derived)
+        writer = CsvWriter(out_path, names) if file_format == "csv" else ArrowWriter(out_path, names, file_format)
+        frames = 0
+        try:
+            for chunk in range(reader.chunk_count):
+                columns = convert_chunk(reader, chunk, derived)
+                writer.write(columns)
+                frames += len(columns[0])
+                if progress is not None and progress(chunk + 1, reader.chunk_count) is False:
+                    break
+        finally:
+            writer.close()
+        return frames
+    finally:
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a recorded Consult session")
+    parser.add_argument("session", help="recorded session file (.cvrec)")
+    parser.add_argument("out", help="output file, the format follows the extension unless --format is given")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="output format")
+    args = parser.parse_args()
+
+    try:
+        frames = export_session(args.session, args.out, args.format)
+    except (OSError, SessionFormatError, ExportError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {frames} frames to {args.out}")
+    return 0
+
+
+# Entrypoint
+if __name__ == "__main__":
+    sys.exit(main())
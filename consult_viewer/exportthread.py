@@ -0,0 +1,39 @@
+from PySide6.QtCore import QThread, Signal
+
+from export import export_session, ExportError
+from sessionfile import SessionFormatError
+
+
+class ExportThread(QThread):
+    '''
+    Runs export_session() off the GUI thread. Progress and the outcome are reported
+    through queued signals; cancel() stops the export after the current chunk.
+    '''
+    progressChanged = Signal(int, int)  # chunks done, chunk count
+    exportFinished = Signal(int)  # frames exported
+    exportFailed = Signal(str)
+
+    def __init__(self, session_path: str, out_path: str, parent=None):
+        super().__init__(parent)
+        self._session_path = session_path
+        self._out_path = out_path
+        self._cancel_requested = False
+
+    @property
+    def out_path(self):
+        return self._out_path
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            frames = export_session(self._session_path, self._out_path, progress=self._report_progress)
+        except (OSError, SessionFormatError, ExportError) as e:
+            self.exportFailed.emit(str(e))
+            return
+        self.exportFinished.emit(frames)
+
+    def _report_progress(self, done, total):
+        self.progressChanged.emit(done, total)
+        return not self._cancel_requested
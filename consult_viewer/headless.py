@@ -0,0 +1,119 @@
+import argparse
+import logging
+import signal
+import sys
+import threading
+import time
+
+import consult_interface as consult
+
+from consultlink import ConsultSession, StreamPoller
+from derived import parse_channels, ExpressionError
+from recorder import SessionRecorder
+
+STATUS_INTERVAL = 10.0  # s
+
+#
+# Records the ECU stream straight to a session file without any GUI. Only the
+# acquisition and recorder modules are used, so PySide6 is never imported:
+#
+#   python -m consult_viewer --headless --port /dev/ttyUSB0 --params "Engine Speed,Coolant Temp@1" --out run.cvrec
+#
+# Derived channels given with --derived "NAME [UNIT] = EXPRESSION" are saved with the
+# session, see derived.py.
+#
+
+
+def parse_parameters(spec: str):
+    '''
+    Resolves a comma separated list of NAME[@HZ] entries, where NAME is a parameter
+    name or id, to (parameters, target rates by id).
+    '''
+    by_key = {}
+    for param in consult.Definition.get_parameters():
+        by_key[param.name.lower()] = param
+        by_key[str(param.id).lower()] = param
+
+    params, target_rates = [], {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        key, _, rate = entry.partition("@")
+        param = by_key.get(key.strip().lower())
+        if param is None:
+            raise ValueError(f"Unknown parameter '{key.strip()}'")
+        if param not in params:
+            params.append(param)
+        if rate:
+            target_rates[param.id] = float(rate)
+    if not params:
+        raise ValueError("No parameters given")
+    return params, target_rates
+
+
+def report_status(recorder, poller, stopped):
+    while not stopped.wait(STATUS_INTERVAL):
+        logging.info(f"{recorder.frames_written} frames written, {recorder.frames_dropped} dropped, "
+                     f"{poller.desyncs} resyncs, {poller.reconnects} reconnects")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="consult_viewer --headless",
+                                     description="Record the Consult stream to a session file without the GUI")
+    parser.add_argument("--port", required=True, help="serial port or pyserial URL of the Consult interface")
+    parser.add_argument("--params", required=True, metavar="NAME[@HZ],...",
+                        help="parameters to record, optionally with a target rate in Hz")
+    parser.add_argument("--out", required=True, help="session file to write")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--derived", action="append", default=[], metavar="'NAME [UNIT] = EXPRESSION'",
+                        help="derived channel to save with the session, may be repeated")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(filename)s:%(lineno)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.INFO)
+
+    try:
+        params, target_rates = parse_parameters(args.params)
+        derived = parse_channels(args.derived, params)  # computed from recorded parameters only
+    except (ValueError, ExpressionError) as e:
+        parser.error(str(e))
+
+    # the session layout follows the definition order, like the GUI's enabled parameters
+    selected = {param.id for param in params}
+    for param in consult.Definition.get_parameters():
+        param.enable(param.id in selected)
+    params = consult.Definition.get_enabled_parameters()
+
+    poller = StreamPoller(ConsultSession(args.port))
+    poller.set_target_rates(target_rates)
+    poller.set_parameters(params)
+    recorder = SessionRecorder(args.out, params, derived=derived)
+    poller.add_sink(recorder.write)
+
+    def request_stop(*_):
+        poller.stop()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    if args.duration is not None:
+        timer = threading.Timer(args.duration, poller.stop)
+        timer.daemon = True
+        timer.start()
+
+    stopped = threading.Event()
+    threading.Thread(target=report_status, args=(recorder, poller, stopped), name="Status", daemon=True).start()
+    recorder.start()
+    start = time.monotonic()
+    # a lost or missing interface is retried until stopped, so the recording survives unplugging
+    try:
+        poller.run()
+    finally:
+        stopped.set()
+        recorder.stop()
+        elapsed = time.monotonic() - start
+        logging.info(f"Recorded {recorder.frames_written} frames in {elapsed:.1f} s to '{args.out}'")
+    return 0
+
+
+# Entrypoint
+if __name__ == "__main__":
+    sys.exit(main())
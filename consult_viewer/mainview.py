@@ -1,26 +1,56 @@
+import time
+_import_start = time.perf_counter()
+
 import sys
+import json
+import math
 import logging
+import argparse
 
-from PySide6.QtCore import QSettings
-from PySide6.QtWidgets import QSizePolicy, QApplication, QMainWindow, QMessageBox, QInputDialog
-from PySide6.QtGui import QAction
+from PySide6.QtCore import QSettings, QTimer
+from PySide6.QtWidgets import (QSizePolicy, QApplication, QMainWindow, QMessageBox, QInputDialog, QFileDialog, QLabel,
+                               QProgressDialog)
+from PySide6.QtGui import QAction, QActionGroup
 
 import PySide6QtAds as QtAds
+import consult_interface as consult
 
-from parametertable import ParameterTableView
-from options import OptionsView
+from derived import DerivedChannelStore, ExpressionError, parse_channel, parse_channels
+from sessionfile import SessionFormatError, SESSION_FILE_FILTER
+from parametertable import ParameterTableView, RefreshTicker, DEFAULT_REFRESH_RATE
+from selection import ParameterSelection, PresetStore
 from statuslog import StatusLogView
-from dockutils import DockableView, create_and_dock_view
+from diagnostics import PipelineMonitor, DiagnosticsView, format_status
+from dockutils import DockableView, create_and_dock_view, create_and_dock_lazy_view
+from utility import StartupProfile
+
+# the acquisition, connection, recording, replay, options and chart modules are imported when first used
+_import_time = time.perf_counter() - _import_start
+
+
+MAIN_CONNECTION = "Main"
 
 
 # Subclass QMainWindow to customize your application's main window
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, port=None, refresh_rate=DEFAULT_REFRESH_RATE, profile=None):
         super().__init__()
+        self._profile = profile or StartupProfile()
 
         # init vars
+        self._record_act = None
+        self._open_session_act = None
+        self._export_session_act = None
+        self._add_connection_act = None
+        self._remove_connection_act = None
+        self._pause_act = None
+        self._seek_act = None
+        self._speed_group = None
         self._store_perspective_act = None
         self._delete_perspective_act = None
+        self._store_preset_act = None
+        self._delete_preset_act = None
+        self._derived_channels_act = None
         self._quit_act = None
         self._about_act = None
         self._about_qt_act = None
@@ -33,10 +63,29 @@ class MainWindow(QMainWindow):
         self._table_view = None
         self._log_view = None
         self._options_view = None
+        self._chart_view = None
+        self._diagnostics_view = None
+        self._status_readout = None
+
+        self._acquisition = None
+        self._recorder = None
+        self._replay = None
+        self._export = None
+        self._refresh_rate = refresh_rate
+        self._ticker = RefreshTicker(refresh_rate, self)
+        self._connections = {}  # name -> (EcuConnection, docks)
+        self._status_texts = {}  # connection name -> status bar readout
+        self._selection = ParameterSelection(self)
+        self._monitor = PipelineMonitor(self)
+        self._monitor.add_drop_counter(self.frames_dropped)
 
         self._global_settings_file = QSettings("cv_settings.cfg", QSettings.Format.IniFormat)
+        self._presets = PresetStore(self._global_settings_file)
+        self._derived_store = DerivedChannelStore(self._global_settings_file)
+        self._derived = []
 
         # setup dock manager
+        dock_mgr_start = time.perf_counter()
         QtAds.CDockManager.setConfigFlag(QtAds.CDockManager.FocusHighlighting, True)
         QtAds.CDockManager.setConfigFlag(QtAds.CDockManager.DockAreaHasTabsMenuButton, False)
         QtAds.CDockManager.setConfigFlag(QtAds.CDockManager.OpaqueSplitterResize, True)
@@ -49,18 +98,38 @@ class MainWindow(QMainWindow):
         # load perspectives
         self._dock_mgr.loadPerspectives(self._global_settings_file)
         self._current_perspective = ""
+        self._profile.add("dock manager", time.perf_counter() - dock_mgr_start)
 
         # setup main window
-        self.create_actions()
-        self.create_menus()
-        self.create_status_bar()
+        with self._profile.step("actions and menus"):
+            self.create_actions()
+            self.create_menus()
+            self.create_status_bar()
         self.create_dock_windows()
 
-        # connect options update to table view
-        self._options_view.parameterSelectionChanged.connect(self._table_view.parameters_changed)
+        self._selection.selectionChanged.connect(self.parameter_selection_changed)
+        self.restore_target_rates()
+        self._selection.targetRatesChanged.connect(self.target_rates_changed)
+        self._table_view.targetRateChosen.connect(self._selection.set_target_rates)
+        self.restore_derived_channels()
+        self.restore_thresholds()
+        self._selection.thresholdsChanged.connect(self.thresholds_changed)
+        self._table_view.thresholdsChosen.connect(self._selection.set_thresholds)
+        self.restore_precisions()
+        self._selection.precisionsChanged.connect(self.precisions_changed)
+        self._table_view.precisionChosen.connect(self._selection.set_precisions)
+        self._monitor.watch_paints(self._table_view.viewport())
+        self._table_view.valuesChanged.connect(self._monitor.values_changed)
+        self._monitor.set_update_counters(self._table_view.update_counters)
+        self._monitor.statsUpdated.connect(lambda stats: self.show_stats(MAIN_CONNECTION, stats))
+
+        if port is not None:
+            with self._profile.step("start acquisition"):
+                self.start_acquisition(port)
 
         self.setWindowTitle("Consult Viewer")
-        self.restore_window_state()
+        with self._profile.step("restore window state"):
+            self.restore_window_state()
 
         logging.debug("Main window initialized.")
 
@@ -68,6 +137,15 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         self.save_window_state()
+        self.stop_recording()
+        self.stop_replay()
+        if self._export is not None:
+            self._export.cancel()
+            self._export.wait()
+        if self._acquisition is not None:
+            self._acquisition.stop()
+        for connection, _ in self._connections.values():
+            connection.stop()
 
     # methods
 
@@ -78,7 +156,355 @@ class MainWindow(QMainWindow):
                           "customer to add a customer name and address, and click "
                           "standard paragraphs to add them.")
 
+    def start_acquisition(self, port):
+        from acquisition import AcquisitionThread
+
+        self._acquisition = AcquisitionThread(port, self)
+        self.connect_frame_source(self._acquisition)
+        self._acquisition.linkStatusChanged.connect(lambda connected, msg: self.statusBar().showMessage(msg))
+        self._acquisition.set_target_rates(self._selection.target_rates())
+        self._acquisition.set_parameters(consult.Definition.get_enabled_parameters())
+        self._acquisition.start()
+        self._record_act.setEnabled(True)
+        self._open_session_act.setEnabled(False)
+
+    def parameter_selection_changed(self, changes):
+        if len(changes) == 1:
+            self._table_view.parameter_toggled(*changes[0])
+        else:
+            self._table_view.parameters_changed()
+        if self._acquisition is not None:
+            self._acquisition.set_parameters(consult.Definition.get_enabled_parameters())
+
+    def target_rates_changed(self, target_rates):
+        self._global_settings_file.setValue("streaming/targetrates",
+                                            json.dumps({str(param_id): rate for param_id, rate in target_rates.items()}))
+        if self._acquisition is not None:
+            self._acquisition.set_target_rates(target_rates)
+
+    def restore_target_rates(self):
+        saved = json.loads(self._global_settings_file.value("streaming/targetrates", "{}"))
+        for param_id in self._selection.param_ids():
+            rate = saved.get(str(param_id))
+            if rate:
+                self._selection.set_target_rates([param_id], rate)
+
+    def thresholds_changed(self, thresholds):
+        # thresholds are a display setting shared by the tables of all connections
+        self._global_settings_file.setValue("display/thresholds",
+                                            json.dumps({str(param_id): limits for param_id, limits in thresholds.items()}))
+        self._table_view.set_thresholds(thresholds)
+        for connection, _ in self._connections.values():
+            connection.table_view.set_thresholds(thresholds)
+
+    def restore_thresholds(self):
+        saved = json.loads(self._global_settings_file.value("display/thresholds", "{}"))
+        for param_id in self._selection.param_ids() + [channel.id for channel in self._derived]:
+            limits = saved.get(str(param_id))
+            if limits:
+                self._selection.set_thresholds([param_id], *(math.nan if limit is None else limit for limit in limits))
+        self._table_view.set_thresholds(self._selection.thresholds())
+
+    def precisions_changed(self, precisions):
+        # like thresholds, the decimals shown are shared by the tables of all connections
+        self._global_settings_file.setValue("display/precisions",
+                                            json.dumps({str(param_id): decimals
+                                                        for param_id, decimals in precisions.items()}))
+        self._table_view.set_precisions(precisions)
+        for connection, _ in self._connections.values():
+            connection.table_view.set_precisions(precisions)
+
+    def restore_precisions(self):
+        saved = json.loads(self._global_settings_file.value("display/precisions", "{}"))
+        for param_id in self._selection.param_ids() + [channel.id for channel in self._derived]:
+            decimals = saved.get(str(param_id))
+            if decimals is not None:
+                self._selection.set_precisions([param_id], decimals)
+        self._table_view.set_precisions(self._selection.precisions())
+
+    def set_derived_channels(self, channels):
+        self._derived = list(channels)
+        if self._replay is None:  # a replay shows the channels recorded with the session
+            self._table_view.set_derived_channels(self._derived)
+        for connection, _ in self._connections.values():
+            connection.table_view.set_derived_channels(self._derived)
+
+    def restore_derived_channels(self):
+        channels = []
+        for definition in self._derived_store.definitions():
+            try:
+                channels.append(parse_channel(definition, consult.Definition.get_parameters()))
+            except ExpressionError as e:
+                logging.warning(f"Skipping derived channel: {e}")
+        self.set_derived_channels(channels)
+
+    def edit_derived_channels(self):
+        text = "\n".join(channel.definition for channel in self._derived)
+        while True:
+            text, ok = QInputDialog.getMultiLineText(
+                self, "Derived Channels",
+                "One channel per line as NAME [UNIT] = EXPRESSION, with parameters in braces:\n"
+                "e.g. AFR [AFR] = {Left O2 Sensor} * 2 + 10", text)
+            if not ok:
+                return
+            try:
+                channels = parse_channels(text.splitlines(), consult.Definition.get_parameters())
+                break
+            except ExpressionError as e:
+                QMessageBox.warning(self, "Derived Channels", str(e))
+        self._derived_store.save(channels)
+        self.set_derived_channels(channels)
+        logging.info(f"{len(channels)} derived channels defined")
+
+    def show_stats(self, name, stats):
+        self._status_texts[name] = format_status(stats)
+        if name == MAIN_CONNECTION and self._recorder is not None:
+            self._status_texts[name] += (f" | recorded {self._recorder.frames_written}"
+                                         f" skipped {self._recorder.frames_skipped}")
+        if len(self._status_texts) == 1:
+            self._status_readout.setText(self._status_texts[name])
+        else:
+            self._status_readout.setText(" || ".join(f"{n}: {text}" for n, text in self._status_texts.items()))
+        if self._diagnostics_view is not None:
+            self._diagnostics_view.set_stats(name, stats)
+
+    def add_connection(self, port=None):
+        from connections import EcuConnection
+        from options import OptionsView
+
+        if port is None:
+            port, entered = QInputDialog.getText(self, "Add Connection", "Serial port or pyserial URL:")
+            if not entered or len(port) == 0:
+                return
+        if port in self._connections or port == MAIN_CONNECTION:
+            QMessageBox.warning(self, "Add Connection", f"'{port}' is already connected")
+            return
+
+        connection = EcuConnection(port, self._ticker, self._refresh_rate, self)
+        connection.linkStatusChanged.connect(
+            lambda name, connected, msg: self.statusBar().showMessage(f"{name}: {msg}"))
+        connection.table_view.set_derived_channels(self._derived)
+        connection.table_view.set_thresholds(self._selection.thresholds())
+        connection.table_view.thresholdsChosen.connect(self._selection.set_thresholds)
+        connection.table_view.set_precisions(self._selection.precisions())
+        connection.table_view.precisionChosen.connect(self._selection.set_precisions)
+        connection.monitor.statsUpdated.connect(lambda stats, n=connection.name: self.show_stats(n, stats))
+        table_dock, _ = create_and_dock_view(self, self._dock_mgr, f"Parameter Table ({connection.name})",
+                                             QtAds.RightDockWidgetArea, connection.table_view)
+        options_dock, _ = create_and_dock_lazy_view(self, self._dock_mgr, f"Options ({connection.name})",
+                                                    QtAds.SideBarRight, lambda: OptionsView(connection.selection))
+        docks = (table_dock, options_dock)
+        for dock in docks:
+            self._windows_menu.addAction(dock.toggleViewAction())
+        self._connections[connection.name] = (connection, docks)
+        connection.start()
+        self._remove_connection_act.setEnabled(True)
+        logging.info(f"Added connection '{connection.name}'")
+
+    def remove_connection(self):
+        names = list(self._connections)
+        if not names:
+            return
+
+        selected, ok = QInputDialog.getItem(self, "Remove Connection", "Select connection to remove:",
+                                            names, editable=False)
+        if not ok:
+            return
+        connection, docks = self._connections.pop(selected)
+        connection.stop()
+        for dock in docks:
+            self._windows_menu.removeAction(dock.toggleViewAction())
+            self._dock_mgr.removeDockWidget(dock)
+            dock.deleteLater()
+        connection.deleteLater()
+        self._status_texts.pop(selected, None)
+        if self._diagnostics_view is not None:
+            self._diagnostics_view.remove_connection(selected)
+        self._remove_connection_act.setEnabled(bool(self._connections))
+        logging.info(f"Removed connection '{selected}'")
+
+    def frame_sources(self):
+        return [source for source in (self._acquisition, self._replay) if source is not None]
+
+    def connect_frame_source(self, source):
+        # the monitor is connected right after the table so it sees each frame just after the model update
+        source.frameReceived.connect(self._table_view.frame_received)
+        source.frameReceived.connect(self._monitor.frame_received)
+        if self._chart_view is not None:
+            source.frameReceived.connect(self._chart_view.frame_received)
+        self._monitor.reset()
+
+    def frames_dropped(self):
+        dropped = 0
+        if self._acquisition is not None:
+            dropped += self._acquisition.frames_dropped
+        if self._recorder is not None:
+            dropped += self._recorder.frames_dropped
+        return dropped
+
+    def toggle_recording(self, checked):
+        if checked:
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def start_recording(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Record Session", "", SESSION_FILE_FILTER)
+        if not path:
+            self._record_act.setChecked(False)
+            return
+
+        from recorder import SessionRecorder
+
+        self._recorder = SessionRecorder(path, consult.Definition.get_enabled_parameters(), derived=self._derived,
+                                         available_params=consult.Definition.get_parameters())
+        self._recorder.start()
+        self._acquisition.add_frame_sink(self._recorder.write)
+        self.statusBar().showMessage(f"Recording to {path}")
+
+    def stop_recording(self):
+        if self._recorder is None:
+            return
+        self._acquisition.remove_frame_sink(self._recorder.write)
+        self._recorder.stop()
+        self.statusBar().showMessage(f"Recorded {self._recorder.frames_written} frames to {self._recorder.path}")
+        self._recorder = None
+        self._record_act.setChecked(False)
+
+    def open_session(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Session", "", SESSION_FILE_FILTER)
+        if not path:
+            return
+
+        from replay import ReplayThread
+
+        self.stop_replay()
+        try:
+            self._replay = ReplayThread(path, self)
+        except (OSError, SessionFormatError) as e:
+            QMessageBox.warning(self, "Open Session", str(e))
+            return
+
+        # show the recorded parameters and derived channels in the table
+        self._selection.replace(param.id for param in self._replay.reader.parameters)
+        self._table_view.set_derived_channels(self._replay.derived)
+
+        duration = self._replay.duration
+        self.connect_frame_source(self._replay)
+        self._replay.positionChanged.connect(
+            lambda position: self.statusBar().showMessage(f"Replay {position:.1f} / {duration:.1f} s"))
+        self._replay.endReached.connect(lambda: self.statusBar().showMessage("Replay finished"))
+        self._replay.set_speed(self._speed_group.checkedAction().data())
+        self._replay.set_paused(self._pause_act.isChecked())
+        self._replay.start()
+        self._pause_act.setEnabled(True)
+        self._seek_act.setEnabled(True)
+
+    def export_session(self):
+        from export import EXPORT_FILE_FILTER
+        from exportthread import ExportThread
+
+        session_path, _ = QFileDialog.getOpenFileName(self, "Export Session", "", SESSION_FILE_FILTER)
+        if not session_path:
+            return
+        out_path, _ = QFileDialog.getSaveFileName(self, "Export Session To", "", EXPORT_FILE_FILTER)
+        if not out_path:
+            return
+
+        # the export runs on its own thread, so the window stays responsive without re-entering it
+        self._export = ExportThread(session_path, out_path, self)
+        progress = QProgressDialog("Exporting session...", "Cancel", 0, 100, self)
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(self._export.cancel)
+        self._export.progressChanged.connect(lambda done, total: progress.setValue(round(100 * done / total)))
+        self._export.exportFinished.connect(
+            lambda frames: self.statusBar().showMessage(f"Exported {frames} frames to {out_path}"))
+        self._export.exportFailed.connect(lambda message: QMessageBox.warning(self, "Export Session", message))
+        self._export.finished.connect(progress.deleteLater)
+        self._export.finished.connect(self.export_finished)
+        self._export_session_act.setEnabled(False)
+        self._export.start()
+
+    def export_finished(self):
+        self._export.deleteLater()
+        self._export = None
+        self._export_session_act.setEnabled(True)
+
+    def stop_replay(self):
+        if self._replay is None:
+            return
+        self._replay.stop()
+        self._replay = None
+        self._table_view.set_derived_channels(self._derived)
+        self._pause_act.setEnabled(False)
+        self._seek_act.setEnabled(False)
+
+    def set_replay_speed(self, speed):
+        if self._replay is not None:
+            self._replay.set_speed(speed)
+
+    def set_replay_paused(self, paused):
+        if self._replay is not None:
+            self._replay.set_paused(paused)
+
+    def seek_replay(self):
+        seconds, ok = QInputDialog.getDouble(self, "Seek", "Seconds from start:", 0.0, 0.0,
+                                             self._replay.duration, 1)
+        if ok:
+            self._replay.seek(seconds)
+
     def create_actions(self):
+        self._open_session_act = QAction("&Open Session...",
+                                         parent=self,
+                                         shortcut="Ctrl+O",
+                                         statusTip="Replay a recorded session",
+                                         triggered=self.open_session)
+
+        self._export_session_act = QAction("&Export Session...",
+                                           parent=self,
+                                           statusTip="Convert a recorded session to CSV, Parquet or Arrow",
+                                           triggered=self.export_session)
+
+        self._add_connection_act = QAction("Add &Connection...",
+                                           parent=self,
+                                           statusTip="Connect another Consult interface, e.g. a second car",
+                                           triggered=lambda: self.add_connection())
+
+        self._remove_connection_act = QAction("Remove Connection...",
+                                              parent=self,
+                                              enabled=False,
+                                              statusTip="Disconnect an added Consult interface",
+                                              triggered=self.remove_connection)
+
+        self._pause_act = QAction("&Pause",
+                                  parent=self,
+                                  shortcut="Space",
+                                  checkable=True,
+                                  enabled=False,
+                                  statusTip="Pause or resume the replay",
+                                  toggled=self.set_replay_paused)
+
+        self._seek_act = QAction("&Seek...",
+                                 parent=self,
+                                 enabled=False,
+                                 statusTip="Jump to a time in the replayed session",
+                                 triggered=self.seek_replay)
+
+        self._speed_group = QActionGroup(self)
+        for label, speed in (("1x", 1.0), ("2x", 2.0), ("5x", 5.0), ("10x", 10.0), ("As fast as possible", 0.0)):
+            action = QAction(label, self._speed_group, checkable=True, statusTip=f"Replay at {label.lower()}")
+            action.setData(speed)
+            action.triggered.connect(lambda checked, s=speed: self.set_replay_speed(s))
+        self._speed_group.actions()[0].setChecked(True)
+
+        self._record_act = QAction("&Record",
+                                   parent=self,
+                                   shortcut="Ctrl+R",
+                                   checkable=True,
+                                   enabled=False,
+                                   statusTip="Record the raw ECU stream to a session file",
+                                   toggled=self.toggle_recording)
+
         self._quit_act = QAction("&Quit",
                                  parent=self,
                                  shortcut="Ctrl+Q",
@@ -104,8 +530,35 @@ class MainWindow(QMainWindow):
                                                statusTip="Remove a perspective",
                                                triggered=self.delete_perspective)
 
+        self._store_preset_act = QAction("Save",
+                                         parent=self,
+                                         statusTip="Save the enabled parameters as a preset",
+                                         triggered=self.store_preset)
+
+        self._delete_preset_act = QAction("Delete",
+                                          parent=self,
+                                          statusTip="Remove a parameter preset",
+                                          triggered=self.delete_preset)
+
+        self._derived_channels_act = QAction("&Derived Channels...",
+                                             parent=self,
+                                             statusTip="Define channels computed from other parameters",
+                                             triggered=self.edit_derived_channels)
+
     def create_menus(self):
         self._file_menu = self.menuBar().addMenu("&File")
+        self._file_menu.addAction(self._record_act)
+        self._file_menu.addAction(self._open_session_act)
+        self._file_menu.addAction(self._export_session_act)
+        playback_menu = self._file_menu.addMenu("Playback")
+        playback_menu.addAction(self._pause_act)
+        playback_menu.addAction(self._seek_act)
+        speed_menu = playback_menu.addMenu("Speed")
+        speed_menu.addActions(self._speed_group.actions())
+        self._file_menu.addSeparator()
+        self._file_menu.addAction(self._add_connection_act)
+        self._file_menu.addAction(self._remove_connection_act)
+        self._file_menu.addSeparator()
         self._file_menu.addAction(self._quit_act)
         self._view_menu = self.menuBar().addMenu("&View")
         perspective_menu = self._view_menu.addMenu("Perspectives")
@@ -125,6 +578,20 @@ class MainWindow(QMainWindow):
             perspective_menu.addAction(self._delete_perspective_act)
 
         perspective_menu.aboutToShow.connect(refresh_perspective_actions)
+        preset_menu = self._view_menu.addMenu("Parameter Presets")
+
+        def refresh_preset_actions():
+            preset_menu.clear()
+            for preset_name in self._presets.names():
+                action = QAction(preset_name, self, statusTip=f"Enable the parameters of the '{preset_name}' preset")
+                action.triggered.connect(lambda checked, n=preset_name: self.apply_preset(n))
+                preset_menu.addAction(action)
+            preset_menu.addSeparator()
+            preset_menu.addAction(self._store_preset_act)
+            preset_menu.addAction(self._delete_preset_act)
+
+        preset_menu.aboutToShow.connect(refresh_preset_actions)
+        self._view_menu.addAction(self._derived_channels_act)
         self._view_menu.addSeparator()
         self._windows_menu = self._view_menu.addMenu("Windows")
 
@@ -136,6 +603,8 @@ class MainWindow(QMainWindow):
 
     def create_status_bar(self):
         self.statusBar().showMessage("Ready")
+        self._status_readout = QLabel()
+        self.statusBar().addPermanentWidget(self._status_readout)
 
     def save_window_state(self):
         '''
@@ -191,29 +660,120 @@ class MainWindow(QMainWindow):
             logging.info(f"Removed perspective '{selected}'")
             self._dock_mgr.savePerspectives(self._global_settings_file)
 
+    def apply_preset(self, name):
+        param_ids, perspective = self._presets.load(name, self._selection.param_ids())
+        logging.info(f"Applying parameter preset '{name}'")
+        self._selection.replace(param_ids)
+        if perspective and perspective in self._dock_mgr.perspectiveNames():
+            self._current_perspective = perspective
+            self._dock_mgr.openPerspective(perspective)
+
+    def store_preset(self):
+        name, entered = QInputDialog.getText(self, "Save Parameter Preset", "Enter unique name:")
+        if not entered or len(name) == 0:
+            return
+
+        no_perspective = "(none)"
+        perspective_names = [no_perspective] + self._dock_mgr.perspectiveNames()
+        try:
+            current = perspective_names.index(self._current_perspective)
+        except ValueError:
+            current = 0
+        perspective, ok = QInputDialog.getItem(self, "Save Parameter Preset", "Open with perspective:",
+                                               perspective_names, current=current, editable=False)
+        if not ok:
+            return
+
+        try:
+            self._presets.save(name, self._selection.enabled_ids(), "" if perspective == no_perspective else perspective)
+        except ValueError as e:
+            QMessageBox.warning(self, "Save Parameter Preset", str(e))
+            return
+        logging.info(f"Added parameter preset '{name}'")
+
+    def delete_preset(self):
+        preset_names = self._presets.names()
+        if not preset_names:
+            return
+
+        selected, ok = QInputDialog.getItem(self, "Delete Parameter Preset", "Select preset to delete:",
+                                            preset_names, editable=False)
+        if ok:
+            self._presets.remove(selected)
+            logging.info(f"Removed parameter preset '{selected}'")
+
     def create_dock_windows(self):
         # set the table view as the central widget (the main view)
-        table_dock = QtAds.CDockWidget("Parameter Table", self)
-        self._table_view = ParameterTableView(table_dock)
-        table_dock.setWidget(self._table_view)
-        table_dock.setMinimumSizeHintMode(QtAds.CDockWidget.MinimumSizeHintFromContent)
-        self._dock_mgr.setCentralWidget(table_dock)
-
-        # create the auto-hide dockable views
-        self._options_view = OptionsView()
-        options_dock_view, options_dock_container = create_and_dock_view(self, self._dock_mgr, "Options",
-                                                                         QtAds.SideBarRight,
-                                                                         self._options_view)
-        self._log_view = StatusLogView()
-        statuslog_dock_view, statuslog_dock_container = create_and_dock_view(self, self._dock_mgr, "Status Log",
-                                                                             QtAds.BottomDockWidgetArea,
-                                                                             self._log_view)
+        with self._profile.step("parameter table"):
+            table_dock = QtAds.CDockWidget("Parameter Table", self)
+            self._table_view = ParameterTableView(table_dock, self._refresh_rate, self._ticker)
+            table_dock.setWidget(self._table_view)
+            table_dock.setMinimumSizeHintMode(QtAds.CDockWidget.MinimumSizeHintFromContent)
+            self._dock_mgr.setCentralWidget(table_dock)
+
+        # the status log is created right away so it captures startup messages, the other views are only
+        # created once their dock is first shown
+        with self._profile.step("status log"):
+            self._log_view = StatusLogView()
+            statuslog_dock_view, statuslog_dock_container = create_and_dock_view(self, self._dock_mgr, "Status Log",
+                                                                                 QtAds.BottomDockWidgetArea,
+                                                                                 self._log_view)
+        options_dock_view, options_dock_container = create_and_dock_lazy_view(self, self._dock_mgr, "Options",
+                                                                              QtAds.SideBarRight,
+                                                                              self.create_options_view,
+                                                                              self.options_view_created)
+        chart_dock_view, chart_dock_container = create_and_dock_lazy_view(self, self._dock_mgr, "Strip Chart",
+                                                                          QtAds.BottomDockWidgetArea,
+                                                                          self.create_chart_view,
+                                                                          self.chart_view_created)
+        diagnostics_dock_view, diagnostics_dock_container = create_and_dock_lazy_view(self, self._dock_mgr,
+                                                                                      "Diagnostics",
+                                                                                      QtAds.SideBarBottom,
+                                                                                      DiagnosticsView,
+                                                                                      self.diagnostics_view_created)
         self._windows_menu.addAction(options_dock_view.toggleViewAction())
         self._windows_menu.addAction(statuslog_dock_view.toggleViewAction())
+        self._windows_menu.addAction(chart_dock_view.toggleViewAction())
+        self._windows_menu.addAction(diagnostics_dock_view.toggleViewAction())
+
+    def create_options_view(self):
+        with self._profile.step("options (deferred)"):
+            from options import OptionsView
+            return OptionsView(self._selection)
+
+    def options_view_created(self, view):
+        self._options_view = view
+
+    def create_chart_view(self):
+        with self._profile.step("strip chart (deferred)"):
+            from stripchart import StripChartView
+            return StripChartView()
+
+    def chart_view_created(self, view):
+        self._chart_view = view
+        view.set_channels(self._table_view.selected_parameters())
+        self._table_view.selectedParametersChanged.connect(view.set_channels)
+        for source in self.frame_sources():
+            source.frameReceived.connect(view.frame_received)
+
+    def diagnostics_view_created(self, view):
+        self._diagnostics_view = view
 
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Consult Viewer")
+    parser.add_argument("--port", action="append", default=[],
+                        help="serial port or pyserial URL of the Consult interface, repeat to connect several")
+    parser.add_argument("--refresh-rate", type=float, default=DEFAULT_REFRESH_RATE,
+                        help="table refresh rate in Hz (default: %(default)s)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long imports and the construction of each view took")
+    args, qt_args = parser.parse_known_args()
+
+    profile = StartupProfile(_import_start)
+    profile.add("module imports", _import_time)
+    with profile.step("QApplication"):
+        app = QApplication(sys.argv[:1] + qt_args)
 
     logging.basicConfig(
         format="%(asctime)s %(levelname)s [%(filename)s:%(lineno)s] %(message)s",
@@ -227,8 +787,13 @@ def main():
         logging.critical("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
     sys.excepthook = handle_exception
 
-    window = MainWindow()
-    window.show()
+    window = MainWindow(args.port[0] if args.port else None, args.refresh_rate, profile)
+    for port in args.port[1:]:
+        window.add_connection(port)
+    with profile.step("show main window"):
+        window.show()
+    if args.profile_startup:
+        QTimer.singleShot(0, lambda: print(profile.report(), flush=True))
 
     app.exec()
 
@@ -1,41 +1,180 @@
-import logging
-
-from PySide6.QtCore import Signal
-from PySide6.QtWidgets import QWidget, QCheckBox, QHBoxLayout, QVBoxLayout, QGroupBox, QSizePolicy
+from PySide6.QtCore import Qt, Slot, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QListView, QLineEdit, QComboBox,
+                               QPushButton, QSizePolicy)
 import consult_interface as consult
 from dockutils import DockableView
-from utility import resize_font
 
+GROUP_NONE = "None"
+GROUP_UNIT = "Unit"
+
+
+class ParameterListModel(QAbstractListModel):
+    '''
+    Checkable list of all consult.Definition parameters, optionally grouped under
+    header rows. Check marks reflect a ParameterSelection; checking rows changes the
+    selection in one transaction.
+    '''
+    def __init__(self, selection, parent=None):
+        super().__init__(parent)
+        self._selection = selection
+        self._params = consult.Definition.get_parameters()
+        self._rows = []  # parameter, or the title of a group header
+        self._group_by = GROUP_NONE
+        self._header_font = QFont()
+        self._header_font.setBold(True)
+        self._rebuild_rows()
+        selection.selectionChanged.connect(self.refresh_selection)
+
+    def set_grouping(self, group_by: str):
+        self.beginResetModel()
+        self._group_by = group_by
+        self._rebuild_rows()
+        self.endResetModel()
+
+    def _rebuild_rows(self):
+        if self._group_by == GROUP_UNIT:
+            groups = {}
+            for param in self._params:
+                groups.setdefault(param.unit_label or "No unit", []).append(param)
+            self._rows = []
+            for title in sorted(groups):
+                self._rows.append(title)
+                self._rows.extend(groups[title])
+        else:
+            self._rows = list(self._params)
+
+    @Slot(list)
+    def refresh_selection(self, changes=None):
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1), [Qt.ItemDataRole.CheckStateRole])
+
+    def is_header(self, row: int) -> bool:
+        return isinstance(self._rows[row], str)
+
+    def parameter_at(self, row: int):
+        entry = self._rows[row]
+        return None if isinstance(entry, str) else entry
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def flags(self, index):
+        if self.is_header(index.row()):
+            return Qt.ItemFlag.ItemIsEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsUserCheckable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        if isinstance(entry, str):
+            if role == Qt.ItemDataRole.DisplayRole:
+                return entry
+            if role == Qt.ItemDataRole.FontRole:
+                return self._header_font
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return entry.name
+        if role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if self._selection.is_enabled(entry.id) else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return entry.unit_label
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.CheckStateRole or not index.isValid() or self.is_header(index.row()):
+            return False
+        self.set_checked([index.row()], Qt.CheckState(value) == Qt.CheckState.Checked)
+        return True
+
+    def set_checked(self, rows, checked: bool):
+        params = (self.parameter_at(row) for row in rows)
+        self._selection.set_many([param.id for param in params if param is not None], checked)
 
-class OptionsView(QWidget, DockableView):
-    parameterSelectionChanged = Signal()
 
+class ParameterFilterProxyModel(QSortFilterProxyModel):
+    '''
+    Filters parameters by name. Group headers are kept while any of their parameters
+    matches.
+    '''
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._text = ""
+
+    def set_text_filter(self, text):
+        self._text = text.lower()
+        self.invalidateFilter()
+
+    def _matches(self, param):
+        return self._text in param.name.lower()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._text:
+            return True
+        model = self.sourceModel()
+        if not model.is_header(source_row):
+            return self._matches(model.parameter_at(source_row))
+        for row in range(source_row + 1, model.rowCount()):
+            if model.is_header(row):
+                break
+            if self._matches(model.parameter_at(row)):
+                return True
+        return False
+
+
+class OptionsView(QWidget, DockableView):
+    def __init__(self, selection, parent=None):
+        super().__init__(parent)
+        self._model = ParameterListModel(selection, self)
+        self._proxy = ParameterFilterProxyModel(self)
+        self._proxy.setSourceModel(self._model)
+
         layout = QHBoxLayout(self)
         param_selection = self.setup_parameter_selection()
         layout.addWidget(param_selection)
         self.setLayout(layout)
-        self.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        self.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Preferred)
 
     def setup_parameter_selection(self):
-        def create_param_checkbox(param):
-            def param_state_changed(ecu_param, state):
-                logging.debug("State changed for param {} to {}".format(ecu_param.name, state))
-                ecu_param.enable(state)
-                self.parameterSelectionChanged.emit()
-
-            check = QCheckBox(param.name)
-            check.setFont(resize_font(check.font(), 10))
-            check.setContentsMargins(0, 0, 0, 0)
-            check.stateChanged.connect(lambda state, p=param: param_state_changed(p, state == 2))
-            return check
-
         param_gb = QGroupBox("ECU Parameters", self)
         param_layout = QVBoxLayout(param_gb)
-        for param_def in consult.Definition.get_parameters():
-            param_layout.addWidget(create_param_checkbox(param_def))
+
+        filter_edit = QLineEdit(param_gb)
+        filter_edit.setPlaceholderText("Filter parameters")
+        filter_edit.setClearButtonEnabled(True)
+        filter_edit.textChanged.connect(self._proxy.set_text_filter)
+        param_layout.addWidget(filter_edit)
+
+        group_combo = QComboBox(param_gb)
+        group_combo.addItems([f"Group by: {group}" for group in (GROUP_NONE, GROUP_UNIT)])
+        group_combo.currentIndexChanged.connect(
+            lambda i: self._model.set_grouping((GROUP_NONE, GROUP_UNIT)[i]))
+        param_layout.addWidget(group_combo)
+
+        self._list = QListView(param_gb)
+        self._list.setModel(self._proxy)
+        self._list.setUniformItemSizes(True)
+        self._list.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        param_layout.addWidget(self._list)
+
+        buttons = QHBoxLayout()
+        select_button = QPushButton("Select shown", param_gb)
+        select_button.setToolTip("Enable every parameter matching the filter")
+        select_button.clicked.connect(lambda: self.set_shown_checked(True))
+        clear_button = QPushButton("Clear shown", param_gb)
+        clear_button.setToolTip("Disable every parameter matching the filter")
+        clear_button.clicked.connect(lambda: self.set_shown_checked(False))
+        buttons.addWidget(select_button)
+        buttons.addWidget(clear_button)
+        param_layout.addLayout(buttons)
         return param_gb
 
+    @Slot(bool)
+    def set_shown_checked(self, checked: bool):
+        proxy = self._proxy
+        rows = [proxy.mapToSource(proxy.index(row, 0)).row() for row in range(proxy.rowCount())]
+        self._model.set_checked(rows, checked)
+
     def initial_expanded_size(self) -> int:
-        return self.layout().layout().sizeHint().width() + 20
+        return self.layout().sizeHint().width() + 20
@@ -1,25 +1,124 @@
 import array
 import enum
+import math
+import time
 
-from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Slot, QTimer
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QTableView, QAbstractItemView
-from random import randrange
+from PySide6.QtCore import Qt, QObject, QAbstractTableModel, QModelIndex, QSize, Signal, Slot, QTimer
+from PySide6.QtGui import QAction, QBrush, QColor, QFont, QFontMetrics, QPalette
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QTableView, QAbstractItemView, QMenu, QStyledItemDelegate,
+                               QInputDialog, QMessageBox)
 import consult_interface as consult
 
 class ColumnId(enum.IntEnum):
     NAME = 0
     VALUE = 1
     UNITS = 2
+    RATE = 3
+
+DEFAULT_REFRESH_RATE = 30  # Hz
+RATE_INTERVAL = 1000  # ms between updates of the effective rate column
+TARGET_RATES = (0, 20, 10, 5, 1)  # Hz offered in the context menu, 0 streams in every frame
+PRECISIONS = (-1, 0, 1, 2, 3)  # decimals offered in the context menu, -1 for the unit's default
+STALE_TIMEOUT = 2.0  # s without an update before a value is shown as stale
+
+# decimals shown by unit label (lower case), DEFAULT_PRECISION for other units
+UNIT_PRECISION = {
+    "rpm": 0, "km/h": 0, "mph": 0, "c": 0, "°c": 0, "f": 0, "°f": 0, "deg": 0, "°": 0, "deg btdc": 0, "°btdc": 0,
+    "mv": 0, "%": 1, "ms": 2, "v": 2, "afr": 2, "lambda": 3,
+}
+DEFAULT_PRECISION = 2
+VALUE_DIGITS = 5  # integer digits the Value column is sized for
+CELL_MARGIN = 6  # px left and right of the text in the size hint
+
+# per row value state bits, painted by ValueDelegate
+VALUE_LOW = 1  # below the parameter's low threshold
+VALUE_HIGH = 2  # above the parameter's high threshold
+VALUE_STALE = 4  # not updated within STALE_TIMEOUT
+VALUE_LIMITS = VALUE_LOW | VALUE_HIGH
+
+
+class RefreshTicker(QObject):
+    '''
+    The display refresh timer. Table models sharing one ticker emit their coalesced
+    updates in the same event loop pass, so several tables are repainted together
+    rather than each on its own schedule.
+    '''
+    tick = Signal()
+
+    def __init__(self, refresh_rate=DEFAULT_REFRESH_RATE, parent=None):
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.tick)
+        self.set_refresh_rate(refresh_rate)
+        self._timer.start()
+
+    def set_refresh_rate(self, refresh_rate):
+        self._timer.setInterval(max(1, round(1000 / refresh_rate)))
+
 
 class ConsultParameterTableModel(QAbstractTableModel):
-    def __init__(self, parent=None):
+    '''
+    The enabled parameters and their live values. Rows follow consult.Definition, or
+    a ParameterSelection when the model belongs to a connection with its own
+    selection, followed by the derived channels.
+    '''
+    def __init__(self, parent=None, refresh_rate=DEFAULT_REFRESH_RATE, ticker=None, selection=None):
         super().__init__(parent)
-        self._columns = ["Parameter Name", "Value", "Units"]
-        self._params = consult.Definition.get_enabled_parameters()
+        self._selection = selection
+        self._columns = ["Parameter Name", "Value", "Units", "Hz"]
+        self._params = []
+        self._row_count = 0
+        self._row_by_id = {}
+        self._derived = []
+        self._derived_plans = {}  # frame parameter ids -> [(row, evaluate, input rows)]
+
+        # live values and their receipt timestamps (monotonic ns) indexed by row, preallocated for every
+        # parameter the definition knows about so the store never grows during a session
+        capacity = len(consult.Definition.get_parameters())
+        self._values = array.array('d', [math.nan]) * capacity
+        self._timestamps = array.array('q', [0]) * capacity
+        self._no_values = array.array('d', self._values)
+        self._no_timestamps = array.array('q', self._timestamps)
+
+        # values received per row since the last rate update, and the resulting effective rate in Hz
+        self._update_counts = array.array('I', [0]) * capacity
+        self._rates = array.array('d', [0.0]) * capacity
+        self._no_counts = array.array('I', self._update_counts)
+        self._no_rates = array.array('d', self._rates)
+        self._rate_start = time.monotonic()
+
+        # threshold limits (nan for none) and VALUE_* state bits by row, so painting a value is a single read
+        self._thresholds = {}  # parameter id -> (low, high)
+        self._lows = array.array('d', [math.nan]) * capacity
+        self._highs = array.array('d', [math.nan]) * capacity
+        self._states = bytearray(capacity)
+
+        # formatted values by row, None until a changed value is displayed, and the format and
+        # size hint of every row derived from its parameter's precision
+        self._precisions = {}  # parameter id -> decimals, overriding UNIT_PRECISION
+        self._font_metrics = QFontMetrics(QFont())
+        self._texts = [None] * capacity
+        self._formats = [None] * capacity
+        self._size_hints = [None] * capacity
+        self._no_texts = [None] * capacity
+        self.updates_unchanged = 0
+        self._rebuild_rows()
+
+        # value changes are coalesced between display ticks and emitted as a single dataChanged range
+        self._pending_rows = set()
+        self.updates_received = 0
+        self.updates_merged = 0
+        self.updates_dropped = 0
+        self.ticks_emitted = 0
+        self._ticker = ticker or RefreshTicker(refresh_rate, self)
+        self._ticker.tick.connect(self.flush_updates)
+        self._rate_timer = QTimer(self)
+        self._rate_timer.setInterval(RATE_INTERVAL)
+        self._rate_timer.timeout.connect(self.update_rates)
+        self._rate_timer.start()
 
     def rowCount(self, parent=QModelIndex()):
-        count = consult.Definition.count_enabled_parameters()
-        return count
+        return self._row_count
 
     def columnCount(self, parent=QModelIndex()):
         count = len(self._columns)
@@ -35,62 +134,486 @@ class ConsultParameterTableModel(QAbstractTableModel):
             return str(section + 1)
 
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
-        if role == Qt.ItemDataRole.DisplayRole:
+        if role == Qt.ItemDataRole.DisplayRole and index.column() == ColumnId.VALUE:
+            row = index.row()
+            text = self._texts[row]
+            if text is None:
+                value = self._values[row]
+                if math.isnan(value):  # nothing received yet
+                    return None
+                text = self._texts[row] = self._formats[row].format(value)
+            return text
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            if index.column() in (ColumnId.VALUE, ColumnId.RATE):
+                return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        elif role == Qt.ItemDataRole.SizeHintRole:
+            if index.column() == ColumnId.VALUE:
+                return self._size_hints[index.row()]
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            if index.column() == ColumnId.VALUE and self._states[index.row()] & VALUE_STALE:
+                age = (time.monotonic_ns() - self._timestamps[index.row()]) / 1e9
+                return f"No update for {age:.1f} s"
+        elif role == Qt.ItemDataRole.DisplayRole:
             if index.column() == 0:
                 return self._params[index.row()].name
-            elif index.column() == 1:
-                value = self._params[index.row()].get_value()
-                if value is None:
-                    return randrange(0, 100)
-                return value
             elif index.column() == 2:
                 return self._params[index.row()].unit_label
+            elif index.column() == 3:
+                return round(self._rates[index.row()], 1)
         return None
 
     def flags(self, index):
         return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
 
+    def parameter_at(self, row):
+        return self._params[row]
+
     def param_id_to_row(self, param_id):
-        for i, param in enumerate(self._params):
-            if param.id == param_id:
-                return i
-        return -1
+        return self._row_by_id.get(param_id, -1)
 
     def parameters_changed(self):
         self.beginResetModel()
-        self._params = consult.Definition.get_enabled_parameters()
+        self._rebuild_rows()
+        self._pending_rows.clear()
         self.endResetModel()
 
+    def parameter_toggled(self, param_id, enabled):
+        '''
+        Inserts or removes the single row of a parameter that was enabled or disabled.
+        Returns the affected row, or -1 if the table already reflected the change.
+        '''
+        param_row = self._row_by_id.get(param_id, -1)
+        if enabled == (param_row != -1):
+            return -1
+
+        count = self._row_count
+        values, timestamps = self._values, self._timestamps
+        counts, rates, states, texts = self._update_counts, self._rates, self._states, self._texts
+        if enabled:
+            params = self._enabled_parameters()
+            param_row = next((row for row, param in enumerate(params) if param.id == param_id), -1)
+            if param_row == -1 or len(params) + len(self._derived) != count + 1:
+                self.parameters_changed()
+                return -1
+            self.beginInsertRows(QModelIndex(), param_row, param_row)
+            values[param_row + 1:count + 1] = values[param_row:count]
+            timestamps[param_row + 1:count + 1] = timestamps[param_row:count]
+            counts[param_row + 1:count + 1] = counts[param_row:count]
+            rates[param_row + 1:count + 1] = rates[param_row:count]
+            states[param_row + 1:count + 1] = states[param_row:count]
+            texts[param_row + 1:count + 1] = texts[param_row:count]
+            values[param_row] = math.nan
+            timestamps[param_row] = 0
+            counts[param_row] = 0
+            rates[param_row] = 0.0
+            states[param_row] = 0
+            texts[param_row] = None
+            self._params.insert(param_row, params[param_row])
+            self._row_count += 1
+            self._pending_rows = {row + 1 if row >= param_row else row for row in self._pending_rows}
+            self._row_by_id = {param.id: row for row, param in enumerate(self._params)}
+            self._derived_plans.clear()
+            self._update_limits()
+            self._update_formats()
+            self.endInsertRows()
+        else:
+            self.beginRemoveRows(QModelIndex(), param_row, param_row)
+            values[param_row:count - 1] = values[param_row + 1:count]
+            timestamps[param_row:count - 1] = timestamps[param_row + 1:count]
+            counts[param_row:count - 1] = counts[param_row + 1:count]
+            rates[param_row:count - 1] = rates[param_row + 1:count]
+            states[param_row:count - 1] = states[param_row + 1:count]
+            texts[param_row:count - 1] = texts[param_row + 1:count]
+            values[count - 1] = math.nan
+            timestamps[count - 1] = 0
+            counts[count - 1] = 0
+            rates[count - 1] = 0.0
+            states[count - 1] = 0
+            texts[count - 1] = None
+            del self._params[param_row]
+            self._row_count -= 1
+            self._pending_rows = {row - 1 if row > param_row else row
+                                  for row in self._pending_rows if row != param_row}
+            self._row_by_id = {param.id: row for row, param in enumerate(self._params)}
+            self._derived_plans.clear()
+            self._update_limits()
+            self._update_formats()
+            self.endRemoveRows()
+        return param_row
+
+    def set_derived_channels(self, channels):
+        '''
+        Shows the derived channels as rows after the parameters. A channel is computed
+        from the latest values of its inputs whenever a frame updates one of them, as
+        long as all of its inputs are shown.
+        '''
+        self._reserve(len(consult.Definition.get_parameters()) + len(channels))
+        self._derived = list(channels)
+        self.parameters_changed()
+
+    def _reserve(self, capacity):
+        # grows the per row stores in place, the delegate keeps a reference to the states
+        missing = capacity - len(self._values)
+        if missing <= 0:
+            return
+        for store, empty in ((self._values, math.nan), (self._no_values, math.nan), (self._timestamps, 0),
+                             (self._no_timestamps, 0), (self._update_counts, 0), (self._no_counts, 0),
+                             (self._rates, 0.0), (self._no_rates, 0.0), (self._lows, math.nan),
+                             (self._highs, math.nan), (self._states, 0), (self._texts, None),
+                             (self._formats, None), (self._size_hints, None), (self._no_texts, None)):
+            store.extend([empty] * missing)
+
+    def _derived_plan(self, param_ids):
+        # the channels to recompute after a frame: those with an input in the frame, all inputs shown
+        # and no value of their own in the frame (replayed frames carry the recorded channels' values)
+        received = set(param_ids)
+        plan = []
+        for channel in self._derived:
+            input_rows = [self._row_by_id.get(input_id, -1) for input_id in channel.input_ids]
+            if channel.id not in received and received.intersection(channel.input_ids) and -1 not in input_rows:
+                plan.append((self._row_by_id[channel.id], channel.evaluate, input_rows))
+        return plan
+
+    def _enabled_parameters(self):
+        if self._selection is not None:
+            return self._selection.enabled_parameters()
+        return consult.Definition.get_enabled_parameters()
+
+    def _rebuild_rows(self):
+        # the row count and id -> row index are only invalidated by a selection change
+        self._params = self._enabled_parameters() + self._derived
+        self._derived_plans.clear()
+        self._row_count = len(self._params)
+        self._row_by_id = {param.id: row for row, param in enumerate(self._params)}
+        self._values[:] = self._no_values
+        self._timestamps[:] = self._no_timestamps
+        self._update_counts[:] = self._no_counts
+        self._rates[:] = self._no_rates
+        self._states[:] = bytes(len(self._states))
+        self._texts[:] = self._no_texts
+        self._update_limits()
+        self._update_formats()
+
+    def set_refresh_rate(self, refresh_rate):
+        self._ticker.set_refresh_rate(refresh_rate)
+
+    def update_counters(self):
+        return {
+            "received": self.updates_received,
+            "unchanged": self.updates_unchanged,
+            "merged": self.updates_merged,
+            "dropped": self.updates_dropped,
+            "ticks": self.ticks_emitted,
+        }
+
+    def value_timestamp(self, row):
+        return self._timestamps[row]
+
+    def value_rate(self, row):
+        return self._rates[row]
+
+    def value_state(self, row):
+        return self._states[row]
+
+    @property
+    def value_states(self) -> bytearray:
+        # updated in place, never replaced, so views may keep a reference
+        return self._states
+
+    def thresholds(self, param_id):
+        return self._thresholds.get(param_id, (math.nan, math.nan))
+
+    def set_thresholds(self, thresholds: dict):
+        '''
+        Sets the (low, high) limits by parameter id outside of which values are
+        highlighted, nan for no limit.
+        '''
+        self._thresholds = dict(thresholds)
+        self._update_limits()
+        if self._row_count:
+            self.dataChanged.emit(self.index(0, ColumnId.VALUE), self.index(self._row_count - 1, ColumnId.VALUE))
+
+    def precision(self, param) -> int:
+        if param.id in self._precisions:
+            return self._precisions[param.id]
+        return UNIT_PRECISION.get((param.unit_label or "").lower(), DEFAULT_PRECISION)
+
+    def set_precisions(self, precisions: dict):
+        '''
+        Overrides the decimals shown by parameter id; parameters not given fall back to
+        UNIT_PRECISION.
+        '''
+        self._precisions = dict(precisions)
+        self._texts[:] = self._no_texts
+        self._update_formats()
+        if self._row_count:
+            self.dataChanged.emit(self.index(0, ColumnId.VALUE), self.index(self._row_count - 1, ColumnId.VALUE))
+
+    def _update_formats(self):
+        # rows sharing a precision share the format string and size hint
+        formats, size_hints = self._formats, self._size_hints
+        by_precision = {}
+        for row, param in enumerate(self._params):
+            precision = self.precision(param)
+            if precision not in by_precision:
+                widest = "-" + "8" * VALUE_DIGITS + ("." + "8" * precision if precision else "")
+                by_precision[precision] = (f"{{:.{precision}f}}", QSize(
+                    self._font_metrics.horizontalAdvance(widest) + 2 * CELL_MARGIN, self._font_metrics.height()))
+            formats[row], size_hints[row] = by_precision[precision]
+
+    def _update_limits(self):
+        lows, highs, values, states = self._lows, self._highs, self._values, self._states
+        for row, param in enumerate(self._params):
+            lows[row], highs[row] = self._thresholds.get(param.id, (math.nan, math.nan))
+            value = values[row]
+            # comparisons with nan are false, so missing limits and values never set a bit
+            states[row] = (states[row] & VALUE_STALE) | (value < lows[row]) | ((value > highs[row]) << 1)
+
+    def frame_received(self, frame) -> bool:
+        '''
+        Stores the values of a frame and returns whether any displayed value changed.
+        '''
+        row_by_id = self._row_by_id
+        changed = False
+        for param_id, value in zip(frame.param_ids, frame.values):
+            param_row = row_by_id.get(param_id, -1)
+            if param_row == -1:
+                self._mark_row_changed(param_row)
+            else:
+                changed |= self._store_value(param_row, value, frame.timestamp_ns)
+        if self._derived:
+            plan = self._derived_plans.get(frame.param_ids)
+            if plan is None:
+                plan = self._derived_plans[frame.param_ids] = self._derived_plan(frame.param_ids)
+            values = self._values
+            for param_row, evaluate, input_rows in plan:
+                changed |= self._store_value(param_row, evaluate(*[values[row] for row in input_rows]),
+                                             frame.timestamp_ns)
+        return changed
+
+    def _store_value(self, param_row, value, timestamp_ns) -> bool:
+        values, states = self._values, self._states
+        self._timestamps[param_row] = timestamp_ns
+        self._update_counts[param_row] += 1
+        # a fresh value is never stale
+        state = (value < self._lows[param_row]) | ((value > self._highs[param_row]) << 1)
+        if value == values[param_row] and state == states[param_row]:
+            # nothing to repaint, the cached text is still valid
+            self.updates_received += 1
+            self.updates_unchanged += 1
+            return False
+        if value != values[param_row]:
+            values[param_row] = value
+            self._texts[param_row] = None
+        states[param_row] = state
+        self._mark_row_changed(param_row)
+        return True
+
     def update_value(self, parameter_id):
-        param_row = self.param_id_to_row(parameter_id)
-        if param_row != -1:
-            self.dataChanged.emit(self.index(param_row, ColumnId.VALUE), self.index(param_row, ColumnId.VALUE))
+        self._mark_row_changed(self.param_id_to_row(parameter_id))
 
     def update_values(self, parameter_ids=None):
         if parameter_ids is None:
-            self.dataChanged.emit(self.index(0, ColumnId.VALUE), self.index(self.rowCount(), ColumnId.VALUE))
+            for param_row in range(self.rowCount()):
+                self._mark_row_changed(param_row)
         else:
             for param_id in parameter_ids:
                 self.update_value(param_id)
 
+    def _mark_row_changed(self, param_row):
+        self.updates_received += 1
+        if param_row == -1:
+            self.updates_dropped += 1
+        elif param_row in self._pending_rows:
+            self.updates_merged += 1
+        else:
+            self._pending_rows.add(param_row)
+
+    @Slot()
+    def flush_updates(self):
+        if not self._pending_rows:
+            return
+        first, last = min(self._pending_rows), max(self._pending_rows)
+        self._pending_rows.clear()
+        self.ticks_emitted += 1
+        self.dataChanged.emit(self.index(first, ColumnId.VALUE), self.index(last, ColumnId.VALUE))
+
+    @Slot()
+    def update_rates(self):
+        now = time.monotonic()
+        elapsed = now - self._rate_start
+        self._rate_start = now
+        if not self._row_count or elapsed <= 0:
+            return
+        counts, rates = self._update_counts, self._rates
+        for row in range(self._row_count):
+            rates[row] = counts[row] / elapsed
+        counts[:] = self._no_counts
+        self.dataChanged.emit(self.index(0, ColumnId.RATE), self.index(self._row_count - 1, ColumnId.RATE))
+        self.update_stale()
+
+    def update_stale(self):
+        '''
+        Flags the values not updated within STALE_TIMEOUT. Rows that never received a
+        value are left alone, they show no value at all.
+        '''
+        cutoff = time.monotonic_ns() - int(STALE_TIMEOUT * 1e9)
+        timestamps, states = self._timestamps, self._states
+        changed = []
+        for row in range(self._row_count):
+            stale = VALUE_STALE if 0 < timestamps[row] < cutoff else 0
+            if stale != states[row] & VALUE_STALE:
+                states[row] = (states[row] & VALUE_LIMITS) | stale
+                changed.append(row)
+        if changed:
+            self.dataChanged.emit(self.index(changed[0], ColumnId.VALUE), self.index(changed[-1], ColumnId.VALUE))
+
+
+class ValueDelegate(QStyledItemDelegate):
+    '''
+    Paints the Value column with a background for values outside their thresholds
+    and greyed out text for stale values. The brushes of every state combination are
+    built up front, so a paint reads one byte from the model's state array.
+    '''
+    def __init__(self, model: ConsultParameterTableModel, parent=None):
+        super().__init__(parent)
+        self._states = model.value_states
+        self._backgrounds = (None, QBrush(QColor(80, 140, 230, 110)), QBrush(QColor(230, 70, 60, 110)), None)
+        self._stale_text = QPalette().color(QPalette.ColorGroup.Disabled, QPalette.ColorRole.Text)
+
+    def paint(self, painter, option, index):
+        state = self._states[index.row()]
+        if not state:
+            super().paint(painter, option, index)
+            return
+        background = self._backgrounds[state & VALUE_LIMITS]
+        if background is not None:
+            painter.fillRect(option.rect, background)
+        if state & VALUE_STALE:
+            option.palette.setColor(QPalette.ColorRole.Text, self._stale_text)
+            option.palette.setColor(QPalette.ColorRole.HighlightedText, self._stale_text)
+        super().paint(painter, option, index)
+
 
 class ParameterTableView(QWidget):
-    def __init__(self, parent):
+    selectedParametersChanged = Signal(list)
+    targetRateChosen = Signal(list, float)  # parameter ids, Hz
+    thresholdsChosen = Signal(list, float, float)  # parameter ids, low, high (nan for none)
+    precisionChosen = Signal(list, int)  # parameter ids, decimals (-1 for the unit's default)
+    valuesChanged = Signal(object)  # a frame that changed displayed values, emitted right after storing it
+
+    def __init__(self, parent, refresh_rate=DEFAULT_REFRESH_RATE, ticker=None, selection=None):
         super().__init__(parent)
         layout = QVBoxLayout(self)
         self._table = QTableView(self)
         self._table.setContentsMargins(0, 0, 0, 0)
 
         # Create and populate the tableWidget
-        # table.setItemDelegate(StarDelegate())
         self._table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self._model = ConsultParameterTableModel()
+        self._model = ConsultParameterTableModel(refresh_rate=refresh_rate, ticker=ticker, selection=selection)
         self._table.setModel(self._model)
+        self._table.setItemDelegateForColumn(ColumnId.VALUE, ValueDelegate(self._model, self._table))
         self._table.resizeColumnsToContents()
+        self._table.selectionModel().selectionChanged.connect(self._emit_selected_parameters)
+        self._model.modelReset.connect(self._emit_selected_parameters)
+        self._model.rowsRemoved.connect(self._emit_selected_parameters)
         layout.addWidget(self._table)
         self.setLayout(layout)
 
+        # the stream rate of the selected parameters is chosen from the context menu
+        rate_menu = QMenu("Stream Rate", self)
+        for rate in TARGET_RATES:
+            label = f"{rate} Hz" if rate else "Every frame"
+            action = rate_menu.addAction(label)
+            action.triggered.connect(lambda checked, r=rate: self._choose_target_rate(r))
+        rate_action = QAction("Stream Rate", self)
+        rate_action.setMenu(rate_menu)
+        self._table.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+        self._table.addAction(rate_action)
+        thresholds_action = QAction("Thresholds...", self, triggered=self._choose_thresholds)
+        self._table.addAction(thresholds_action)
+        precision_menu = QMenu("Decimals", self)
+        for precision in PRECISIONS:
+            action = precision_menu.addAction(str(precision) if precision >= 0 else "Unit default")
+            action.triggered.connect(lambda checked, p=precision: self._choose_precision(p))
+        precision_action = QAction("Decimals", self)
+        precision_action.setMenu(precision_menu)
+        self._table.addAction(precision_action)
+
     @Slot()
     def parameters_changed(self):
         self._model.parameters_changed()
         self._table.resizeColumnsToContents()
+
+    @Slot(object, bool)
+    def parameter_toggled(self, param_id, enabled):
+        param_row = self._model.parameter_toggled(param_id, enabled)
+        if enabled and param_row != -1:
+            self.resize_columns_to_row(param_row)
+
+    def resize_columns_to_row(self, row):
+        # only measure the cells of the given row and grow columns that are too narrow for them
+        for column in range(self._model.columnCount()):
+            width = self._table.sizeHintForIndex(self._model.index(row, column)).width()
+            if width > self._table.columnWidth(column):
+                self._table.setColumnWidth(column, width)
+
+    @Slot(object)
+    def frame_received(self, frame):
+        if self._model.frame_received(frame):
+            self.valuesChanged.emit(frame)
+
+    def viewport(self):
+        return self._table.viewport()
+
+    def update_counters(self):
+        return self._model.update_counters()
+
+    def selected_parameters(self):
+        rows = sorted(index.row() for index in self._table.selectionModel().selectedRows())
+        return [self._model.parameter_at(row) for row in rows]
+
+    def _choose_target_rate(self, rate):
+        param_ids = [param.id for param in self.selected_parameters()]
+        if param_ids:
+            self.targetRateChosen.emit(param_ids, float(rate))
+
+    def _choose_thresholds(self):
+        params = self.selected_parameters()
+        if not params:
+            return
+        low, high = self._model.thresholds(params[0].id)
+        current = ", ".join("" if math.isnan(limit) else f"{limit:g}" for limit in (low, high))
+        text, entered = QInputDialog.getText(self, "Thresholds", "Low and high limit, blank for none:",
+                                             text=current if current != ", " else "")
+        if not entered:
+            return
+        try:
+            low, high = (float(limit) if limit.strip() else math.nan for limit in (text.split(",") + [""])[:2])
+        except ValueError:
+            QMessageBox.warning(self, "Thresholds", f"'{text}' is not a pair of numbers")
+            return
+        self.thresholdsChosen.emit([param.id for param in params], low, high)
+
+    def set_thresholds(self, thresholds):
+        self._model.set_thresholds(thresholds)
+
+    def _choose_precision(self, precision):
+        param_ids = [param.id for param in self.selected_parameters()]
+        if param_ids:
+            self.precisionChosen.emit(param_ids, precision)
+
+    def set_precisions(self, precisions):
+        self._model.set_precisions(precisions)
+        self._table.resizeColumnToContents(ColumnId.VALUE)
+
+    def set_derived_channels(self, channels):
+        self._model.set_derived_channels(channels)
+        self._table.resizeColumnsToContents()
+
+    @Slot()
+    def _emit_selected_parameters(self):
+        self.selectedParametersChanged.emit(self.selected_parameters())
+
+    def set_refresh_rate(self, refresh_rate):
+        self._model.set_refresh_rate(refresh_rate)
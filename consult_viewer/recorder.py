@@ -0,0 +1,183 @@
+import logging
+import queue
+import threading
+import time
+
+from sessionfile import (encode_session_header, encode_index, presence_length, full_presence, CHUNK_HEADER,
+                         CHUNK_MAGIC, RECORD_TIMESTAMP)
+
+CHUNK_RECORDS = 1024
+CHUNK_FLUSH_INTERVAL = 1.0  # s, bounds how much is lost if the process dies
+DEFAULT_BUFFER_FRAMES = 8192
+
+_STOP = object()
+
+
+class SessionRecorder:
+    '''
+    Appends raw stream frames to a session file. write() only queues the frame and
+    is safe to call from the acquisition thread; a background writer thread packs
+    frames into chunks and writes them to disk. If the bounded buffer is full the
+    frame is counted as dropped rather than blocking acquisition.
+
+    When the stream scheduler only requests some of the parameters, the frame is
+    merged into the last complete payload so every record still holds all of them.
+    The presence mask of each record tells which parameters hold a received value:
+    those not received yet, and those that left the stream's parameter set (e.g.
+    disabled while recording), are marked absent rather than recorded as zero or
+    as their last value. Parameters enabled after recording started are not
+    recorded; the registers of those in available_params are passed over when
+    merging, so the recorded parameters of their frames are still written.
+
+    Derived channels are not recorded as values; the definitions of those whose
+    inputs are all recorded are saved in the session header, and they are computed
+    again on replay and export.
+    '''
+    def __init__(self, path: str, params, buffer_frames: int = DEFAULT_BUFFER_FRAMES, derived=(),
+                 available_params=()):
+        self._path = path
+        self._params = list(params)
+        self._register_counts = {param.id: len(param.registers) for param in available_params}
+        self._param_ids = tuple(p.id for p in self._params)
+        self._derived = [channel for channel in derived
+                         if all(input_id in self._param_ids for input_id in channel.input_ids)]
+        # byte ranges and presence bits of every parameter in the recorded payload, used to merge partial frames
+        self._fields = {}
+        start = 0
+        for index, param in enumerate(self._params):
+            self._fields[param.id] = (start, len(param.registers), index >> 3, 1 << (index & 7))
+            start += len(param.registers)
+        self._frame_length = start
+        self._presence_length = presence_length(len(self._params))
+        self._all_present = full_presence(len(self._params))
+        self._merge_plans = {}
+        self._stream_masks = {}
+        self._queue = queue.Queue(maxsize=buffer_frames)
+        self._thread = None
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0
+
+    @property
+    def path(self):
+        return self._path
+
+    def start(self):
+        header = encode_session_header(self._params,
+                                       created=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                                       monotonic_start_ns=time.monotonic_ns(),
+                                       derived=[channel.definition for channel in self._derived])
+        file = open(self._path, "wb")
+        file.write(header)
+        self._thread = threading.Thread(target=self._write_loop, args=(file,), name="SessionRecorder", daemon=True)
+        self._thread.start()
+        logging.info(f"Recording session to '{self._path}'")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        logging.info(f"Stopped recording '{self._path}': {self.frames_written} frames written, "
+                     f"{self.frames_dropped} dropped, {self.frames_skipped} skipped")
+
+    def write(self, frame):
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def _merge_plan(self, param_ids):
+        # (source offset, destination offset, size, presence byte, presence bit) of each recorded parameter,
+        # or None if the frame holds a parameter of unknown size
+        if param_ids not in self._merge_plans:
+            plan = []
+            source = 0
+            for param_id in param_ids:
+                field = self._fields.get(param_id)
+                if field is None:
+                    if param_id not in self._register_counts:
+                        plan = None
+                        break
+                    source += self._register_counts[param_id]  # not recorded
+                    continue
+                destination, size, byte, bit = field
+                plan.append((source, destination, size, byte, bit))
+                source += size
+            self._merge_plans[param_ids] = plan or None
+        return self._merge_plans[param_ids]
+
+    def _stream_mask(self, stream_ids):
+        # presence bits of the recorded parameters the stream still serves
+        if stream_ids not in self._stream_masks:
+            mask = bytearray(self._presence_length)
+            for param_id in stream_ids:
+                field = self._fields.get(param_id)
+                if field is not None:
+                    mask[field[2]] |= field[3]
+            self._stream_masks[stream_ids] = mask
+        return self._stream_masks[stream_ids]
+
+    def _write_loop(self, file):
+        index = []
+        payload = bytearray(self._frame_length)
+        presence = bytearray(self._presence_length)
+        stream_ids = None
+        records = bytearray()
+        count = 0
+        first_ts = last_ts = 0
+        last_flush = time.monotonic()
+        with file:
+            while True:
+                try:
+                    frame = self._queue.get(timeout=CHUNK_FLUSH_INTERVAL)
+                except queue.Empty:
+                    frame = None
+                if frame is _STOP:
+                    break
+                if frame is not None:
+                    if frame.stream_ids and frame.stream_ids != stream_ids:
+                        # parameters that left the stream hold no current value any more
+                        stream_ids = frame.stream_ids
+                        mask = self._stream_mask(stream_ids)
+                        for byte in range(self._presence_length):
+                            presence[byte] &= mask[byte]
+                    if frame.param_ids == self._param_ids:
+                        payload[:] = frame.payload
+                        presence[:] = self._all_present
+                    else:
+                        plan = self._merge_plan(frame.param_ids)
+                        if plan is None:
+                            # the frame holds none of the recorded parameters, or one of unknown size
+                            self.frames_skipped += 1
+                            frame = None
+                        else:
+                            for source, destination, size, byte, bit in plan:
+                                payload[destination:destination + size] = frame.payload[source:source + size]
+                                presence[byte] |= bit
+                if frame is not None:
+                    if count == 0:
+                        first_ts = frame.timestamp_ns
+                    last_ts = frame.timestamp_ns
+                    records += RECORD_TIMESTAMP.pack(frame.timestamp_ns)
+                    records += payload
+                    records += presence
+                    count += 1
+
+                if count and (count >= CHUNK_RECORDS or time.monotonic() - last_flush >= CHUNK_FLUSH_INTERVAL):
+                    self._write_chunk(file, index, records, count, first_ts, last_ts)
+                    records.clear()
+                    count = 0
+                    last_flush = time.monotonic()
+
+            if count:
+                self._write_chunk(file, index, records, count, first_ts, last_ts)
+            file.write(encode_index(index, file.tell()))
+
+    def _write_chunk(self, file, index, records, count, first_ts, last_ts):
+        index.append((file.tell(), first_ts))
+        file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, count, first_ts, last_ts))
+        file.write(records)
+        file.flush()
+        self.frames_written += count
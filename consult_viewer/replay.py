@@ -0,0 +1,166 @@
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from PySide6.QtCore import QThread, QSemaphore, Signal, Slot
+
+from consultlink import Frame, StreamLayout
+from export import convert_chunk, recorded_channels
+from sessionfile import SessionReader, full_presence, present_flags
+
+MAX_FRAMES_IN_FLIGHT = 256
+POSITION_INTERVAL = 0.1  # s
+
+
+class ReplayThread(QThread):
+    '''
+    Plays a recorded session back through the same frameReceived signal as the
+    live AcquisitionThread. A speed of 0 replays as fast as the receivers keep up;
+    frames still in the GUI thread's event queue are bounded so a fast replay never
+    floods it.
+
+    The derived channels saved with the session are evaluated for a whole chunk at a
+    time when playback enters it, and their values are appended to each frame's
+    parameter values (the payload stays the raw recorded one).
+    '''
+    frameReceived = Signal(object)
+    positionChanged = Signal(float)  # seconds from the start of the session
+    endReached = Signal()
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self._reader = SessionReader(path)
+        try:
+            self._derived = recorded_channels(self._reader)
+        except Exception:
+            self._reader.close()
+            raise
+        self._layout = StreamLayout(self._reader.parameters)
+        self._param_ids = self._layout.param_ids + tuple(channel.id for channel in self._derived)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._in_flight = QSemaphore(MAX_FRAMES_IN_FLIGHT)
+        self._speed = 1.0
+        self._paused = False
+        self._reanchor = False
+        self._seek_to = None
+        self._stop_requested = False
+        self.frameReceived.connect(self._frame_delivered)
+
+    @property
+    def reader(self):
+        return self._reader
+
+    @property
+    def derived(self):
+        return self._derived
+
+    @property
+    def duration(self):
+        return (self._reader.end_ns - self._reader.start_ns) / 1e9
+
+    def set_speed(self, speed: float):
+        with self._lock:
+            self._speed = speed
+            self._reanchor = True
+        self._wake.set()
+
+    def set_paused(self, paused: bool):
+        with self._lock:
+            self._paused = paused
+            self._reanchor = True
+        self._wake.set()
+
+    def seek(self, seconds: float):
+        with self._lock:
+            self._seek_to = self._reader.start_ns + int(seconds * 1e9)
+        self._wake.set()
+
+    def stop(self):
+        self._stop_requested = True
+        self._wake.set()
+        self.wait()
+        self._reader.close()
+
+    @Slot(object)
+    def _frame_delivered(self, frame):
+        self._in_flight.release()
+
+    def _derived_rows(self, chunk):
+        # derived channel values of every record in the chunk, as lists of floats
+        columns = convert_chunk(self._reader, chunk, self._derived)[1 + len(self._reader.parameters):]
+        return np.column_stack(columns).tolist()
+
+    def _idle(self, timeout):
+        self._wake.wait(timeout)
+        self._wake.clear()
+
+    def run(self):
+        reader = self._reader
+        layout = self._layout
+        param_ids = self._param_ids
+        records = reader.records()
+        derived_chunk, derived_rows = None, None
+        all_present = full_presence(len(reader.parameters))
+        pending = None
+        ended = False
+        anchor_ts = anchor_wall = None
+        last_position = 0.0
+        logging.info(f"Replaying '{reader.path}': {reader.frame_count} frames, {self.duration:.1f} s")
+
+        while not self._stop_requested:
+            with self._lock:
+                seek_to, self._seek_to = self._seek_to, None
+                reanchor, self._reanchor = self._reanchor, False
+                speed, paused = self._speed, self._paused
+            if seek_to is not None:
+                records = reader.records(reader.seek(seek_to))
+                pending = None
+                ended = False
+                reanchor = True
+            if reanchor:
+                anchor_ts = None
+            if paused:
+                self._idle(POSITION_INTERVAL)
+                continue
+
+            if pending is None:
+                pending = next(records, None)
+                if pending is None:
+                    if not ended:
+                        ended = True
+                        self.endReached.emit()
+                    self._idle(None)
+                    continue
+            (chunk, record), timestamp_ns, payload, presence = pending
+
+            if speed > 0:
+                # pace playback against the recorded receipt timestamps
+                now = time.monotonic_ns()
+                if anchor_ts is None:
+                    anchor_ts, anchor_wall = timestamp_ns, now
+                delay = (anchor_wall + (timestamp_ns - anchor_ts) / speed - now) / 1e9
+                if delay > 0:
+                    self._idle(min(delay, POSITION_INTERVAL))
+                    continue
+
+            if not self._in_flight.tryAcquire(1, 100):
+                continue
+            values = layout.decode(payload)
+            if presence != all_present:
+                # parameters not received at this point of the recording
+                values = tuple(value if present else math.nan
+                               for value, present in zip(values, present_flags(presence, len(values))))
+            if self._derived:
+                if chunk != derived_chunk:
+                    derived_chunk, derived_rows = chunk, self._derived_rows(chunk)
+                values += tuple(derived_rows[record])
+            self.frameReceived.emit(Frame(time.monotonic_ns(), param_ids, payload, values))
+            pending = None
+
+            position = (timestamp_ns - reader.start_ns) / 1e9
+            if abs(position - last_position) >= POSITION_INTERVAL:
+                last_position = position
+                self.positionChanged.emit(position)
@@ -0,0 +1,187 @@
+import json
+import logging
+import math
+from contextlib import contextmanager
+
+from PySide6.QtCore import QObject, QSettings, Signal
+import consult_interface as consult
+
+
+class ParameterSelection(QObject):
+    '''
+    The set of enabled consult.Definition parameters. Changes made between begin()
+    and commit() (or inside a transaction() block) are collected and applied
+    together, so the views and the ECU stream see a single selectionChanged no
+    matter how many parameters changed. Changes made outside a transaction are
+    committed right away. Transactions nest; only the outermost commit applies.
+
+    The selection of the main connection is mirrored into consult.Definition. Further
+    connections keep theirs to themselves, starting from the same parameters.
+    '''
+    selectionChanged = Signal(list)  # [(parameter id, enabled)]
+    targetRatesChanged = Signal(object)  # {parameter id: Hz}
+    thresholdsChanged = Signal(object)  # {parameter id: (low, high)}
+    precisionsChanged = Signal(object)  # {parameter id: decimals}
+
+    def __init__(self, parent=None, mirror_definition=True):
+        super().__init__(parent)
+        self._mirror_definition = mirror_definition
+        self._params = {param.id: param for param in consult.Definition.get_parameters()}
+        self._enabled = {param.id for param in consult.Definition.get_enabled_parameters()}
+        self._pending = {}  # parameter id -> enabled
+        self._depth = 0
+        self._target_rates = {}
+        self._thresholds = {}
+        self._precisions = {}
+
+    def param_ids(self) -> list:
+        return list(self._params)
+
+    def enabled_parameters(self) -> list:
+        return [param for param_id, param in self._params.items() if param_id in self._enabled]
+
+    def is_enabled(self, param_id) -> bool:
+        return self._pending.get(param_id, param_id in self._enabled)
+
+    def enabled_ids(self) -> set:
+        return set(self._enabled)
+
+    def target_rates(self) -> dict:
+        return dict(self._target_rates)
+
+    def set_target_rates(self, param_ids, rate: float):
+        '''
+        Sets the rate in Hz the parameters should be streamed at, 0 to stream them in
+        every frame.
+        '''
+        for param_id in param_ids:
+            if rate > 0:
+                self._target_rates[param_id] = rate
+            else:
+                self._target_rates.pop(param_id, None)
+        self.targetRatesChanged.emit(self.target_rates())
+
+    def thresholds(self) -> dict:
+        return dict(self._thresholds)
+
+    def set_thresholds(self, param_ids, low: float, high: float):
+        '''
+        Sets the range outside of which the parameters' values are highlighted. Either
+        limit may be nan for none; with both nan the parameters are not highlighted.
+        '''
+        for param_id in param_ids:
+            if math.isnan(low) and math.isnan(high):
+                self._thresholds.pop(param_id, None)
+            else:
+                self._thresholds[param_id] = (low, high)
+        self.thresholdsChanged.emit(self.thresholds())
+
+    def precisions(self) -> dict:
+        return dict(self._precisions)
+
+    def set_precisions(self, param_ids, decimals: int):
+        '''
+        Sets the decimals the parameters' values are shown with, a negative number for
+        the default of their unit.
+        '''
+        for param_id in param_ids:
+            if decimals >= 0:
+                self._precisions[param_id] = decimals
+            else:
+                self._precisions.pop(param_id, None)
+        self.precisionsChanged.emit(self.precisions())
+
+    def begin(self):
+        self._depth += 1
+
+    def commit(self):
+        if self._depth == 0:
+            raise RuntimeError("commit() without begin()")
+        self._depth -= 1
+        if self._depth > 0:
+            return
+
+        pending, self._pending = self._pending, {}
+        changes = []
+        for param_id, enabled in pending.items():
+            param = self._params.get(param_id)
+            if param is None or (param_id in self._enabled) == enabled:
+                continue
+            if self._mirror_definition:
+                param.enable(enabled)
+            if enabled:
+                self._enabled.add(param_id)
+            else:
+                self._enabled.discard(param_id)
+            changes.append((param_id, enabled))
+        if changes:
+            logging.debug(f"Parameter selection changed: {len(changes)} parameters")
+            self.selectionChanged.emit(changes)
+
+    def rollback(self):
+        self._pending.clear()
+        self._depth = 0
+
+    @contextmanager
+    def transaction(self):
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def set_enabled(self, param_id, enabled: bool):
+        with self.transaction():
+            self._pending[param_id] = enabled
+
+    def set_many(self, param_ids, enabled: bool):
+        with self.transaction():
+            for param_id in param_ids:
+                self._pending[param_id] = enabled
+
+    def replace(self, param_ids):
+        '''
+        Enables exactly the given parameters and disables all others.
+        '''
+        param_ids = set(param_ids)
+        with self.transaction():
+            for param_id in self._params:
+                self._pending[param_id] = param_id in param_ids
+
+
+class PresetStore:
+    '''
+    Named parameter selections saved in the settings file next to the dock
+    perspectives. A preset may be linked to a perspective that is opened along with
+    it.
+    '''
+    GROUP = "parameterpresets"
+
+    def __init__(self, settings: QSettings):
+        self._settings = settings
+
+    def names(self) -> list:
+        self._settings.beginGroup(self.GROUP)
+        names = self._settings.childKeys()
+        self._settings.endGroup()
+        return sorted(names)
+
+    def save(self, name: str, param_ids, perspective: str = ""):
+        if "/" in name or "\\" in name:
+            raise ValueError("Preset names cannot contain slashes")
+        preset = {"parameters": [str(param_id) for param_id in param_ids], "perspective": perspective}
+        self._settings.setValue(f"{self.GROUP}/{name}", json.dumps(preset))
+
+    def load(self, name: str, known_ids) -> (list, str):
+        '''
+        Returns the ids of the preset's parameters that are among known_ids, and the
+        name of the linked perspective or "".
+        '''
+        preset = json.loads(self._settings.value(f"{self.GROUP}/{name}", "{}"))
+        saved = set(preset.get("parameters", []))
+        return [param_id for param_id in known_ids if str(param_id) in saved], preset.get("perspective", "")
+
+    def remove(self, name: str):
+        self._settings.remove(f"{self.GROUP}/{name}")
@@ -0,0 +1,250 @@
+import bisect
+import json
+import mmap
+import struct
+from array import array
+from typing import NamedTuple
+
+#
+# Session file layout (little endian):
+#
+#   file header   magic, format version, length of the JSON parameter description
+#   JSON          enabled parameters from consult.Definition, the record layout and
+#                 the definitions of the derived channels (see derived.py)
+#   chunk*        chunk header (magic, record count, first and last timestamp)
+#                 followed by record count fixed size records
+#   index         one (chunk offset, first timestamp) entry per chunk
+#   trailer       index magic, index offset, number of index entries
+#
+# Every record is the monotonic receipt timestamp in ns followed by the raw frame
+# payload and a presence mask with one bit per parameter (bit i of byte i // 8 set
+# if parameter i holds a received value), so all records in a session have the
+# same size. The index and trailer are written when recording stops; a session
+# without them (e.g. after a crash) is still readable and its index is rebuilt by
+# walking the chunk headers.
+#
+SESSION_MAGIC = b"CVSESSN\0"
+SESSION_VERSION = 2
+SESSION_HEADER = struct.Struct("<8sHI")
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sIqq")
+RECORD_TIMESTAMP = struct.Struct("<q")
+INDEX_ENTRY = struct.Struct("<Qq")
+INDEX_MAGIC = b"CVINDEX\0"
+INDEX_TRAILER = struct.Struct("<8sQI")
+SESSION_FILE_FILTER = "Consult sessions (*.cvrec)"
+
+
+class SessionFormatError(Exception):
+    pass
+
+
+class RecordedParameter(NamedTuple):
+    id: object
+    name: str
+    unit_label: str
+    registers: tuple
+    scale: float
+    offset: float
+
+
+def describe_parameters(params) -> list:
+    return [{"id": p.id, "name": p.name, "unit": p.unit_label, "registers": list(p.registers),
+             "scale": p.scale, "offset": p.offset} for p in params]
+
+
+def presence_length(param_count: int) -> int:
+    return (param_count + 7) // 8
+
+
+def full_presence(param_count: int) -> bytes:
+    mask = bytearray(presence_length(param_count))
+    for i in range(param_count):
+        mask[i >> 3] |= 1 << (i & 7)
+    return bytes(mask)
+
+
+def present_flags(presence: bytes, param_count: int) -> list:
+    '''
+    Decodes a record's presence mask into one bool per parameter.
+    '''
+    return [bool(presence[i >> 3] >> (i & 7) & 1) for i in range(param_count)]
+
+
+def encode_session_header(params, **info) -> bytes:
+    description = dict(info)
+    description["parameters"] = describe_parameters(params)
+    description["frame_length"] = sum(len(p.registers) for p in params)
+    description["presence_length"] = presence_length(len(params))
+    description["record_size"] = (RECORD_TIMESTAMP.size + description["frame_length"]
+                                  + description["presence_length"])
+    blob = json.dumps(description).encode("utf-8")
+    return SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, len(blob)) + blob
+
+
+def encode_index(entries, index_offset: int) -> bytes:
+    '''
+    Encodes the sparse time index and trailer for a list of (chunk offset, first
+    timestamp) pairs, to be written at index_offset right after the last chunk.
+    '''
+    return (b"".join(INDEX_ENTRY.pack(offset, first_ts) for offset, first_ts in entries)
+            + INDEX_TRAILER.pack(INDEX_MAGIC, index_offset, len(entries)))
+
+
+class SessionReader:
+    '''
+    Memory-maps a recorded session, so opening even very large recordings only reads
+    the header and index. Positions are (chunk, record) pairs; seek() finds the
+    first record at or after a timestamp with two binary searches, one over the
+    chunk index and one over the fixed size records of that chunk.
+    '''
+    def __init__(self, path: str):
+        self._path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # empty file
+            self._file.close()
+            raise SessionFormatError(f"'{path}' is not a session file") from e
+
+        if len(self._map) < SESSION_HEADER.size:
+            self.close()
+            raise SessionFormatError(f"'{path}' is not a session file")
+        magic, version, header_length = SESSION_HEADER.unpack_from(self._map, 0)
+        if magic != SESSION_MAGIC or version != SESSION_VERSION:
+            self.close()
+            raise SessionFormatError(f"'{path}' is not a version {SESSION_VERSION} session file")
+
+        self._chunk_offsets = array('Q')
+        self._chunk_first_ts = array('q')
+        self._chunk_counts = array('I')
+        try:
+            self._read_description(header_length)
+            if not self._read_index():
+                self._scan_chunks()
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            self.close()
+            raise SessionFormatError(f"'{path}' is damaged: {e}") from e
+        self.frame_count = sum(self._chunk_counts)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def chunk_count(self):
+        return len(self._chunk_offsets)
+
+    @property
+    def start_ns(self):
+        return self._chunk_first_ts[0] if self._chunk_offsets else 0
+
+    @property
+    def end_ns(self):
+        if not self._chunk_offsets:
+            return 0
+        _, _, _, last_ts = CHUNK_HEADER.unpack_from(self._map, self._chunk_offsets[-1])
+        return last_ts
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _read_description(self, header_length: int):
+        description_start = SESSION_HEADER.size
+        self.description = json.loads(self._map[description_start:description_start + header_length])
+        self.parameters = [RecordedParameter(p["id"], p["name"], p["unit"], tuple(p["registers"]),
+                                             p["scale"], p["offset"])
+                           for p in self.description["parameters"]]
+        self.derived_definitions = self.description.get("derived", [])
+        self.frame_length = self.description["frame_length"]
+        self.presence_length = self.description["presence_length"]
+        self.record_size = self.description["record_size"]
+        if (self.frame_length != sum(len(p.registers) for p in self.parameters)
+                or self.presence_length != presence_length(len(self.parameters))
+                or self.record_size != RECORD_TIMESTAMP.size + self.frame_length + self.presence_length):
+            raise ValueError("the record layout does not match the parameters")
+        self._data_start = description_start + header_length
+
+    def _read_index(self) -> bool:
+        size = len(self._map)
+        if size - self._data_start < INDEX_TRAILER.size:
+            return False
+        magic, index_offset, entry_count = INDEX_TRAILER.unpack_from(self._map, size - INDEX_TRAILER.size)
+        if magic != INDEX_MAGIC or index_offset + entry_count * INDEX_ENTRY.size + INDEX_TRAILER.size != size:
+            return False
+        for offset, first_ts in INDEX_ENTRY.iter_unpack(self._map[index_offset:size - INDEX_TRAILER.size]):
+            self._chunk_offsets.append(offset)
+            self._chunk_first_ts.append(first_ts)
+            self._chunk_counts.append(CHUNK_HEADER.unpack_from(self._map, offset)[1])
+        return True
+
+    def _scan_chunks(self):
+        offset = self._data_start
+        size = len(self._map)
+        while offset + CHUNK_HEADER.size <= size:
+            magic, count, first_ts, _ = CHUNK_HEADER.unpack_from(self._map, offset)
+            end = offset + CHUNK_HEADER.size + count * self.record_size
+            if magic != CHUNK_MAGIC or end > size:
+                break  # truncated chunk or the index of a session
+            self._chunk_offsets.append(offset)
+            self._chunk_first_ts.append(first_ts)
+            self._chunk_counts.append(count)
+            offset = end
+
+    def _record_offset(self, chunk, record):
+        return self._chunk_offsets[chunk] + CHUNK_HEADER.size + record * self.record_size
+
+    def timestamp_at(self, position):
+        chunk, record = position
+        return RECORD_TIMESTAMP.unpack_from(self._map, self._record_offset(chunk, record))[0]
+
+    def seek(self, timestamp_ns: int):
+        '''
+        Returns the position of the first record at or after timestamp_ns, or None
+        if the session ends before it.
+        '''
+        chunk = max(0, bisect.bisect_right(self._chunk_first_ts, timestamp_ns) - 1)
+        while chunk < len(self._chunk_offsets):
+            low, high = 0, self._chunk_counts[chunk]
+            while low < high:
+                mid = (low + high) // 2
+                if self.timestamp_at((chunk, mid)) < timestamp_ns:
+                    low = mid + 1
+                else:
+                    high = mid
+            if low < self._chunk_counts[chunk]:
+                return chunk, low
+            chunk += 1
+        return None
+
+    def chunk_records(self, chunk: int) -> bytes:
+        '''
+        Returns the fixed size records of a chunk as one block of bytes.
+        '''
+        start = self._record_offset(chunk, 0)
+        return self._map[start:start + self._chunk_counts[chunk] * self.record_size]
+
+    def records(self, position=(0, 0)):
+        '''
+        Yields (position, timestamp_ns, payload, presence mask) for every record from
+        position on.
+        '''
+        if position is None:
+            return
+        chunk, record = position
+        frame_length = self.frame_length
+        presence_end = frame_length + self.presence_length
+        record_size = self.record_size
+        mapped = self._map
+        for chunk in range(chunk, len(self._chunk_offsets)):
+            offset = self._record_offset(chunk, record)
+            for record in range(record, self._chunk_counts[chunk]):
+                timestamp_ns = RECORD_TIMESTAMP.unpack_from(mapped, offset)[0]
+                payload_start = offset + RECORD_TIMESTAMP.size
+                yield ((chunk, record), timestamp_ns, mapped[payload_start:payload_start + frame_length],
+                       mapped[payload_start + frame_length:payload_start + presence_end])
+                offset += record_size
+            record = 0
@@ -0,0 +1,264 @@
+import argparse
+import logging
+import math
+import os
+import random
+import select
+import socket
+import sys
+import time
+import tty
+
+import consult_interface as consult
+
+from consultlink import INIT_SEQUENCE, INIT_ACK, CMD_READ_REGISTER, CMD_STOP, CMD_TERMINATE, FRAME_START
+
+STOP_ACK = 0xCF
+DEFAULT_FRAME_RATE = 50  # Hz
+
+
+class Waveform:
+    '''
+    Produces a value in engineering units for a time in seconds.
+    '''
+    KINDS = ("sine", "ramp", "square", "noise", "constant")
+
+    def __init__(self, kind="sine", low=0.0, high=100.0, period=5.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown waveform '{kind}', expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.period = period
+
+    @classmethod
+    def parse(cls, spec: str):
+        '''
+        Parses kind[:low:high[:period]], e.g. "sine:800:6500:4".
+        '''
+        kind, *numbers = spec.split(":")
+        return cls(kind, *(float(n) for n in numbers))
+
+    def value(self, t: float) -> float:
+        phase = (t / self.period) % 1.0 if self.period > 0 else 0.0
+        if self.kind == "sine":
+            level = 0.5 - 0.5 * math.cos(2 * math.pi * phase)
+        elif self.kind == "ramp":
+            level = phase
+        elif self.kind == "square":
+            level = 1.0 if phase >= 0.5 else 0.0
+        elif self.kind == "noise":
+            level = random.random()
+        else:
+            level = 0.0
+        return self.low + (self.high - self.low) * level
+
+
+class Faults:
+    def __init__(self, latency=0.0, jitter=0.0, drop_rate=0.0, corrupt_rate=0.0):
+        self.latency = latency  # s added before every frame
+        self.jitter = jitter  # s of random extra latency
+        self.drop_rate = drop_rate  # probability that a frame loses one byte
+        self.corrupt_rate = corrupt_rate  # probability that a frame has one corrupted byte
+
+
+class PtyTransport:
+    def __init__(self):
+        self._master, slave = os.openpty()
+        self.name = os.ttyname(slave)
+        # keep the slave open in raw mode so the pty survives the viewer reconnecting
+        tty.setraw(slave)
+        self._slave = slave
+
+    def fileno(self):
+        return self._master
+
+    def wait_for_client(self):
+        pass
+
+    def read(self) -> bytes:
+        return os.read(self._master, 256)
+
+    def write(self, data: bytes):
+        os.write(self._master, data)
+
+
+class TcpTransport:
+    def __init__(self, port: int):
+        self._server = socket.create_server(("127.0.0.1", port))
+        self.name = f"socket://127.0.0.1:{self._server.getsockname()[1]}"
+        self._client = None
+
+    def fileno(self):
+        return self._client.fileno()
+
+    def wait_for_client(self):
+        if self._client is not None:
+            self._client.close()
+        self._client, address = self._server.accept()
+        logging.info(f"Client connected from {address[0]}:{address[1]}")
+
+    def read(self) -> bytes:
+        data = self._client.recv(256)
+        if not data:
+            raise ConnectionResetError("client disconnected")
+        return data
+
+    def write(self, data: bytes):
+        self._client.sendall(data)
+
+
+class EcuSimulator:
+    '''
+    Answers the Consult protocol like an ECU would: it acknowledges initialization,
+    echoes register requests and streams frames for the requested registers of the
+    consult.Definition parameters until it is told to stop.
+    '''
+    def __init__(self, params, frame_rate=DEFAULT_FRAME_RATE, waveforms=None, faults=None):
+        self._frame_interval = 1.0 / frame_rate
+        self._faults = faults or Faults()
+        waveforms = waveforms or {}
+        # register -> (parameter, byte index within the parameter, waveform)
+        self._registers = {}
+        for i, param in enumerate(params):
+            full_scale = param.offset + param.scale * (256 ** len(param.registers) - 1)
+            waveform = waveforms.get(param.name) or Waveform("sine", min(param.offset, full_scale),
+                                                             max(param.offset, full_scale), 3.0 + i)
+            for byte_index, register in enumerate(param.registers):
+                self._registers[register] = (param, byte_index, waveform)
+        self._requested = []
+        self._streaming = False
+        self._commands = bytearray()
+        self._start = time.monotonic()
+
+    def _register_bytes(self, t: float) -> dict:
+        raw_values = {}
+        register_bytes = {}
+        for register, (param, byte_index, waveform) in self._registers.items():
+            raw = raw_values.get(param.id)
+            if raw is None:
+                size = len(param.registers)
+                raw = round((waveform.value(t) - param.offset) / param.scale) if param.scale else 0
+                raw = min(max(raw, 0), 256 ** size - 1).to_bytes(size, "big")
+                raw_values[param.id] = raw
+            register_bytes[register] = raw[byte_index]
+        return register_bytes
+
+    def build_frame(self) -> bytes:
+        register_bytes = self._register_bytes(time.monotonic() - self._start)
+        payload = bytearray(register_bytes.get(register, 0) for register in self._requested)
+        frame = bytearray((FRAME_START, len(payload))) + payload
+
+        faults = self._faults
+        if faults.corrupt_rate and random.random() < faults.corrupt_rate:
+            frame[random.randrange(len(frame))] ^= 1 << random.randrange(8)
+        if faults.drop_rate and random.random() < faults.drop_rate:
+            del frame[random.randrange(len(frame))]
+        return bytes(frame)
+
+    def handle_input(self, data: bytes) -> bytes:
+        '''
+        Consumes command bytes from the client and returns the ECU's replies.
+        '''
+        commands = self._commands
+        commands += data
+        reply = bytearray()
+        while commands:
+            if commands.startswith(INIT_SEQUENCE):
+                del commands[:len(INIT_SEQUENCE)]
+                self._streaming = False
+                self._requested = []
+                reply.append(INIT_ACK)
+            elif commands[0] == CMD_READ_REGISTER:
+                if len(commands) < 2:
+                    break
+                self._requested.append(commands[1])
+                reply += bytes((CMD_READ_REGISTER ^ 0xFF, commands[1]))
+                del commands[:2]
+            elif commands[0] == CMD_TERMINATE:
+                del commands[:1]
+                self._streaming = bool(self._requested)
+            elif commands[0] == CMD_STOP:
+                del commands[:1]
+                self._streaming = False
+                self._requested = []
+                reply.append(STOP_ACK)
+            elif INIT_SEQUENCE.startswith(bytes(commands[:len(INIT_SEQUENCE)])):
+                break  # partial init sequence
+            else:
+                del commands[:1]
+        return bytes(reply)
+
+    def serve(self, transport):
+        while True:
+            transport.wait_for_client()
+            self._streaming = False
+            self._requested = []
+            self._commands.clear()
+            try:
+                self._serve_client(transport)
+            except (ConnectionError, OSError) as e:
+                logging.info(f"Client disconnected: {e}")
+
+    def _serve_client(self, transport):
+        next_frame = time.monotonic()
+        while True:
+            timeout = max(0.0, next_frame - time.monotonic()) if self._streaming else None
+            readable, _, _ = select.select([transport], [], [], timeout)
+            if readable:
+                reply = self.handle_input(transport.read())
+                if reply:
+                    transport.write(reply)
+                next_frame = max(next_frame, time.monotonic())
+                continue
+
+            if self._streaming:
+                faults = self._faults
+                if faults.latency or faults.jitter:
+                    time.sleep(faults.latency + random.random() * faults.jitter)
+                transport.write(self.build_frame())
+                next_frame += self._frame_interval
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Consult ECU")
+    transport_group = parser.add_mutually_exclusive_group()
+    transport_group.add_argument("--pty", action="store_true", help="serve on a pseudo terminal (default)")
+    transport_group.add_argument("--tcp", type=int, metavar="PORT", help="serve on a TCP port, 0 picks a free one")
+    parser.add_argument("--rate", type=float, default=DEFAULT_FRAME_RATE,
+                        help="frames per second (default: %(default)s)")
+    parser.add_argument("--wave", action="append", default=[], metavar="NAME=KIND[:LOW:HIGH[:PERIOD]]",
+                        help="waveform for a parameter, e.g. 'Engine Speed=sine:800:6500:4'")
+    parser.add_argument("--latency", type=float, default=0.0, help="latency added to every frame in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency per frame in ms")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="probability of dropping a byte from a frame")
+    parser.add_argument("--corrupt-rate", type=float, default=0.0,
+                        help="probability of corrupting a byte of a frame")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(filename)s:%(lineno)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.INFO)
+
+    waveforms = {}
+    for spec in args.wave:
+        name, _, waveform = spec.partition("=")
+        try:
+            waveforms[name] = Waveform.parse(waveform)
+        except ValueError as e:
+            parser.error(f"invalid --wave '{spec}': {e}")
+
+    faults = Faults(args.latency / 1000, args.jitter / 1000, args.drop_rate, args.corrupt_rate)
+    simulator = EcuSimulator(consult.Definition.get_parameters(), args.rate, waveforms, faults)
+    transport = TcpTransport(args.tcp) if args.tcp is not None else PtyTransport()
+    print(f"Simulated ECU listening on {transport.name}", flush=True)
+    try:
+        simulator.serve(transport)
+    except KeyboardInterrupt:
+        pass
+
+
+# Entrypoint
+if __name__ == "__main__":
+    sys.exit(main())
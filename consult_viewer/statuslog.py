@@ -1,62 +1,200 @@
 import logging
-from PySide6.QtCore import QObject, Signal, Slot, QCoreApplication
-from PySide6.QtGui import QFont
-from PySide6.QtWidgets import QPlainTextEdit
+import time
+from collections import deque
+from PySide6.QtCore import Qt, Slot, QTimer, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+from PySide6.QtGui import QFont, QColor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListView, QComboBox, QLineEdit, QLabel
 from dockutils import DockableView
 
+DEFAULT_CAPACITY = 200000
+DEFAULT_FLUSH_INTERVAL = 100  # ms
+MAX_PENDING_RECORDS = 10000
 
-#
-# Signals need to be contained in a QObject or subclass in order to be correctly
-# initialized.
-#
-class Signaller(QObject):
-    signal = Signal(str, logging.LogRecord)
+# log entries are kept as compact tuples rather than LogRecord objects
+CREATED, LEVELNO, LOGGER, FILENAME, LINENO, MESSAGE = range(6)
+
+_exception_formatter = logging.Formatter()
 
 
 #
 # Output to a Qt GUI is only supposed to happen on the main thread. So, this
-# handler is designed to take a slot function which is set up to run in the main
-# thread. In this example, the function takes a string argument which is a
-# formatted log message, and the log record which generated it. The formatted
-# string is just a convenience - you could format a string for output any way
-# you like in the slot function itself.
+# handler only reduces the record to a compact tuple and appends it to a deque,
+# which is safe to do from any thread without taking a lock. The GUI side drains
+# the deque on a timer and formats entries only when they are displayed.
 #
-# You specify the slot function to do whatever GUI updates you want. The handler
-# doesn't know or care about specific UI elements.
+# The deque is bounded, so if the GUI falls behind the oldest pending records are
+# discarded instead of growing memory without limit.
 #
 class QtHandler(logging.Handler):
-    def __init__(self, slot_func, *args, **kwargs):
+    def __init__(self, maxlen=MAX_PENDING_RECORDS, *args, **kwargs):
         super(QtHandler, self).__init__(*args, **kwargs)
-        self.signaller = Signaller()
-        self.signaller.signal.connect(slot_func)
+        self.queue = deque(maxlen=maxlen)
 
     def emit(self, record):
-        s = self.format(record)
-        self.signaller.signal.emit(s, record)
+        message = record.getMessage()
+        if record.exc_info:
+            message = message + "\n" + _exception_formatter.formatException(record.exc_info)
+        self.queue.append((record.created, record.levelno, record.name, record.filename, record.lineno, message))
+
+    def drain(self):
+        items = []
+        queue = self.queue
+        try:
+            while True:
+                items.append(queue.popleft())
+        except IndexError:
+            pass
+        return items
+
+
+class LogRecordModel(QAbstractListModel):
+    '''
+    List model over a fixed size ring buffer of log entries. Rows are only
+    formatted when the view asks for them, and the oldest rows are removed once
+    the buffer is full.
+    '''
+    def __init__(self, parent=None, capacity=DEFAULT_CAPACITY):
+        super().__init__(parent)
+        self._capacity = capacity
+        self._entries = [None] * capacity
+        self._start = 0
+        self._count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
 
+    def entry(self, row):
+        return self._entries[(self._start + row) % self._capacity]
 
-class StatusLogView(QPlainTextEdit, DockableView):
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole:
+            entry = self.entry(index.row())
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry[CREATED]))
+            return (f"{timestamp} {logging.getLevelName(entry[LEVELNO])} "
+                    f"[{entry[FILENAME]}:{entry[LINENO]}] {entry[MESSAGE]}")
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            levelno = self.entry(index.row())[LEVELNO]
+            if levelno >= logging.ERROR:
+                return QColor(Qt.GlobalColor.red)
+            elif levelno >= logging.WARNING:
+                return QColor(Qt.GlobalColor.darkYellow)
+        return None
+
+    def append_entries(self, entries):
+        if len(entries) > self._capacity:
+            entries = entries[-self._capacity:]
+
+        overflow = self._count + len(entries) - self._capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for row in range(overflow):
+                self._entries[(self._start + row) % self._capacity] = None
+            self._start = (self._start + overflow) % self._capacity
+            self._count -= overflow
+            self.endRemoveRows()
+
+        first = self._count
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        for row, entry in enumerate(entries, first):
+            self._entries[(self._start + row) % self._capacity] = entry
+        self._count += len(entries)
+        self.endInsertRows()
+
+
+class LogFilterProxyModel(QSortFilterProxyModel):
+    '''
+    Filters log entries by minimum level, logger name prefix and message text.
+    New rows from the source are filtered as they are inserted; the whole buffer is
+    only re-scanned when the filter itself changes.
+    '''
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setReadOnly(True)
-        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
-        self.setFont(QFont("Courier New", 10))
-        # self.setMaximumBlockCount(1000)
-        self.handler = h = QtHandler(self.loghandler)
-        fs = "%(asctime)s %(levelname)s [%(filename)s:%(lineno)s] %(message)s"
-        formatter = logging.Formatter(fmt="%(asctime)s %(levelname)s [%(filename)s:%(lineno)s] %(message)s",
-                                      datefmt="%Y-%m-%d %H:%M:%S")
-        h.setFormatter(formatter)
-        logging.getLogger().addHandler(h)
-
-    @Slot(str, logging.LogRecord)
-    def loghandler(self, status: str, record: logging.LogRecord):
-        self.append(status)
-
-    def append(self, text):
-        self.appendPlainText(text)
-        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
-        QCoreApplication.processEvents()
+        self._min_level = logging.NOTSET
+        self._logger = ""
+        self._text = ""
+
+    def set_min_level(self, level):
+        self._min_level = level
+        self.invalidateFilter()
+
+    def set_logger_filter(self, logger):
+        self._logger = logger
+        self.invalidateFilter()
+
+    def set_text_filter(self, text):
+        self._text = text.lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        entry = self.sourceModel().entry(source_row)
+        if entry[LEVELNO] < self._min_level:
+            return False
+        if self._logger and not entry[LOGGER].startswith(self._logger):
+            return False
+        if self._text and self._text not in entry[MESSAGE].lower():
+            return False
+        return True
+
+
+class StatusLogView(QWidget, DockableView):
+    def __init__(self, parent=None, capacity=DEFAULT_CAPACITY, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        super().__init__(parent)
+        self.handler = QtHandler()
+        logging.getLogger().addHandler(self.handler)
+
+        self._model = LogRecordModel(self, capacity)
+        self._proxy = LogFilterProxyModel(self)
+        self._proxy.setSourceModel(self._model)
+
+        self._list = QListView(self)
+        self._list.setModel(self._proxy)
+        self._list.setUniformItemSizes(True)
+        self._list.setFont(QFont("Courier New", 10))
+        self._list.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self._list.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+
+        level_combo = QComboBox(self)
+        for level in (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL):
+            level_combo.addItem(logging.getLevelName(level), level)
+        level_combo.currentIndexChanged.connect(lambda i: self._proxy.set_min_level(level_combo.itemData(i)))
+
+        logger_edit = QLineEdit(self)
+        logger_edit.setPlaceholderText("Logger")
+        logger_edit.textChanged.connect(self._proxy.set_logger_filter)
+
+        search_edit = QLineEdit(self)
+        search_edit.setPlaceholderText("Search")
+        search_edit.setClearButtonEnabled(True)
+        search_edit.textChanged.connect(self._proxy.set_text_filter)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+        filter_layout.addWidget(QLabel("Level:", self))
+        filter_layout.addWidget(level_combo)
+        filter_layout.addWidget(logger_edit)
+        filter_layout.addWidget(search_edit, 1)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(filter_layout)
+        layout.addWidget(self._list)
+        self.setLayout(layout)
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(flush_interval)
+        self._flush_timer.timeout.connect(self.flush)
+        self._flush_timer.start()
+
+    @Slot()
+    def flush(self):
+        entries = self.handler.drain()
+        if not entries:
+            return
+        scrollbar = self._list.verticalScrollBar()
+        follow = scrollbar.value() == scrollbar.maximum()
+        self._model.append_entries(entries)
+        if follow:
+            self._list.scrollToBottom()
 
     def initial_expanded_size(self) -> int:
         return self.layout().layout().sizeHint().width()
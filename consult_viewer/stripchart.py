@@ -0,0 +1,359 @@
+import math
+from array import array
+
+import numpy as np
+from PySide6.QtCore import Qt, Slot, QTimer, QPointF, QRectF, QByteArray, QDataStream, QIODevice
+from PySide6.QtGui import QPainter, QColor, QPen, QPolygonF, QTransform, QAction, QActionGroup
+from PySide6.QtWidgets import QWidget, QSizePolicy
+from dockutils import DockableView
+from utility import resize_font
+
+DEFAULT_HISTORY = 30 * 60  # s
+DEFAULT_MAX_RATE = 100  # Hz, sizes the per channel history
+DEFAULT_SPAN = 60  # s shown across the width of the chart
+SPANS = (10, 60, 5 * 60, 30 * 60)
+MAX_CHANNELS = 20
+FRAME_RATE = 60  # Hz
+LEGEND_COLUMNS = 4
+RESIZE_DELAY = 100  # ms after the last resize before the columns are rebuilt for the new width
+
+CHANNEL_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f",
+                  "#bcbd22", "#17becf"]
+
+
+class ChannelHistory:
+    '''
+    Ring buffer of (time, value) samples of one channel.
+    '''
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._times = array('d', [0.0]) * capacity
+        self._values = array('f', [0.0]) * capacity
+        self._start = 0
+        self._count = 0
+
+    def append(self, t: float, value: float):
+        end = (self._start + self._count) % self._capacity
+        self._times[end] = t
+        self._values[end] = value
+        if self._count < self._capacity:
+            self._count += 1
+        else:
+            self._start = (self._start + 1) % self._capacity
+
+    def window_since(self, t0: float):
+        '''
+        Returns the times and values of the samples from t0 on as NumPy arrays.
+        '''
+        times = np.frombuffer(self._times, dtype=np.float64)
+        values = np.frombuffer(self._values, dtype=np.float32)
+        end = self._start + self._count
+        if end <= self._capacity:
+            times, values = times[self._start:end], values[self._start:end]
+        else:
+            end -= self._capacity
+            times = np.concatenate((times[self._start:], times[:end]))
+            values = np.concatenate((values[self._start:], values[:end]))
+        first = np.searchsorted(times, t0)
+        return times[first:], values[first:].astype(np.float64)
+
+
+class ColumnDecimator:
+    '''
+    Keeps the min and max of a channel for every pixel column of the visible time
+    span, along with a polygon of (column slot, max) and (column slot, min) points
+    that can be handed to QPainter as is. Columns are numbered by absolute time and
+    stored in a ring, so scrolling only resets the columns that come into view and
+    adding a sample touches a single column.
+
+    The ring has one slot more than the visible width. That slot follows the newest
+    column and always holds the latest value, so the polyline never jumps from the
+    newest column straight to the oldest one.
+    '''
+    def __init__(self, width: int, column_duration: float):
+        self.width = width
+        self.slots = width + 1
+        self.column_duration = column_duration
+        self.mins = array('d', [0.0]) * self.slots
+        self.maxs = array('d', [0.0]) * self.slots
+        self.polygon = self._polygon(self.maxs, self.mins)
+        self.first_column = None
+        self.last_column = None
+        self._last_value = 0.0
+
+    def add(self, t: float, value: float):
+        column = int(t // self.column_duration)
+        if self.last_column is None:
+            self.first_column = self.last_column = column
+            self._fill(range(self.slots), value)
+        elif column > self.last_column:
+            self._scroll_to(column)
+        elif column <= self.last_column - self.width:
+            return  # older than the visible span
+
+        slot = column % self.slots
+        if value < self.mins[slot]:
+            self.mins[slot] = value
+            self.polygon[2 * slot + 1] = QPointF(slot, value)
+        if value > self.maxs[slot]:
+            self.maxs[slot] = value
+            self.polygon[2 * slot] = QPointF(slot, value)
+        if column == self.last_column:
+            self._last_value = value
+            self._fill(((column + 1) % self.slots,), value)
+
+    def load(self, times, values, now: float):
+        '''
+        Fills the columns from time ordered NumPy arrays of samples as if each had been
+        passed to add(), followed by advance_to(now). The samples are reduced per column
+        with NumPy, so only the visible columns are visited in Python.
+        '''
+        if not len(times):
+            return
+        columns = (times // self.column_duration).astype(np.int64)
+
+        # min, max and last value of every column that has samples. Like add(), each column also starts
+        # from the last value of the one before, so the line connects across columns.
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(columns)) + 1))
+        used = columns[starts]
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        lasts = values[np.concatenate((starts[1:] - 1, [len(values) - 1]))]
+        mins[1:] = np.minimum(mins[1:], lasts[:-1])
+        maxs[1:] = np.maximum(maxs[1:], lasts[:-1])
+
+        # columns without samples, and the slot following the newest column, continue from the last value
+        self.first_column = int(used[0])
+        self.last_column = max(int(now // self.column_duration), int(used[-1]))
+        self._last_value = float(values[-1])
+        all_columns = np.arange(max(self.first_column, self.last_column - self.width + 1), self.last_column + 2)
+        source = np.searchsorted(used, all_columns, side="right") - 1
+        has_samples = used[source] == all_columns
+        slot_mins = np.full(self.slots, values[0])
+        slot_maxs = np.full(self.slots, values[0])
+        slots = all_columns % self.slots
+        slot_mins[slots] = np.where(has_samples, mins[source], lasts[source])
+        slot_maxs[slots] = np.where(has_samples, maxs[source], lasts[source])
+        slot_mins[slots[-1]] = slot_maxs[slots[-1]] = self._last_value
+        self.mins = array('d', slot_mins.tobytes())
+        self.maxs = array('d', slot_maxs.tobytes())
+        self.polygon = self._polygon(self.maxs, self.mins)
+
+    @staticmethod
+    def _polygon(maxs, mins):
+        # (slot, max) and (slot, min) of every slot, in slot order. The points are packed in QDataStream's
+        # format (a count, then big endian doubles) and read in one go rather than created one by one.
+        points = np.empty((2 * len(maxs), 2), dtype=">f8")
+        points[:, 0] = np.repeat(np.arange(len(maxs)), 2)
+        points[0::2, 1] = maxs
+        points[1::2, 1] = mins
+        data = QByteArray(np.array([len(points)], dtype=">u4").tobytes() + points.tobytes())
+        polygon = QPolygonF()
+        QDataStream(data, QIODevice.OpenModeFlag.ReadOnly) >> polygon  # the stream reads data in place
+        return polygon
+
+    def advance_to(self, t: float):
+        # keeps channels that stopped updating scrolling along with the others
+        column = int(t // self.column_duration)
+        if self.last_column is not None and column > self.last_column:
+            self._scroll_to(column)
+
+    def _scroll_to(self, column: int):
+        # columns coming into view continue from the last value until they receive samples
+        start = max(self.last_column + 2, column - self.width + 1)
+        self._fill((c % self.slots for c in range(start, column + 2)), self._last_value)
+        self.last_column = column
+
+    def _fill(self, slots, value):
+        for slot in slots:
+            self.mins[slot] = self.maxs[slot] = value
+            point = QPointF(slot, value)
+            self.polygon[2 * slot] = point
+            self.polygon[2 * slot + 1] = point
+
+
+class Channel:
+    def __init__(self, param, color: QColor, capacity: int):
+        self.param = param
+        self.color = color
+        self.history = ChannelHistory(capacity)
+        self.decimator = None
+        self.last_value = math.nan
+
+
+class StripChartView(QWidget, DockableView):
+    '''
+    Charts parameters over time. Every channel keeps its full history in a ring
+    buffer, but painting only draws the per pixel column min/max of the visible
+    span, so redraw cost depends on the widget width rather than the number of
+    samples held. The columns are rebuilt from the history with NumPy when the span
+    changes and, debounced, after the widget was resized.
+    '''
+    def __init__(self, parent=None, history=DEFAULT_HISTORY, max_rate=DEFAULT_MAX_RATE):
+        super().__init__(parent)
+        self._capacity = int(history * max_rate)
+        self._span = DEFAULT_SPAN
+        self._channels = []
+        self._frame_indices = {}  # frame param_ids -> index of each channel in the frame
+        self._latest_time = None
+        self._dirty = False
+
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.setMinimumHeight(120)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.setFont(resize_font(self.font(), 9))
+
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+        span_group = QActionGroup(self)
+        for span in SPANS:
+            label = f"{span} s" if span < 60 else f"{span // 60} min"
+            action = QAction(f"Show {label}", span_group, checkable=True, checked=span == self._span)
+            action.triggered.connect(lambda checked, s=span: self.set_span(s))
+            self.addAction(action)
+
+        self._repaint_timer = QTimer(self)
+        self._repaint_timer.setInterval(round(1000 / FRAME_RATE))
+        self._repaint_timer.timeout.connect(self._repaint_if_dirty)
+        self._repaint_timer.start()
+
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(RESIZE_DELAY)
+        self._resize_timer.timeout.connect(self._resized)
+
+    def initial_expanded_size(self) -> int:
+        return 200
+
+    def set_span(self, seconds: float):
+        self._span = seconds
+        self._rebuild_decimators()
+        self.update()
+
+    @Slot(list)
+    def set_channels(self, params):
+        # channels that stay keep their columns, new ones start out empty
+        existing = {channel.param.id: channel for channel in self._channels}
+        channels = []
+        for i, param in enumerate(params[:MAX_CHANNELS]):
+            channel = existing.get(param.id)
+            if channel is None:
+                channel = Channel(param, QColor(), self._capacity)
+                channel.decimator = self._new_decimator()
+                if self._latest_time is not None:
+                    channel.decimator.advance_to(self._latest_time)
+            channel.color = QColor(CHANNEL_COLORS[i % len(CHANNEL_COLORS)])
+            channels.append(channel)
+        self._channels = channels
+        self._frame_indices.clear()
+        self.update()
+
+    @Slot(object)
+    def frame_received(self, frame):
+        if not self._channels:
+            return
+        indices = self._frame_indices.get(frame.param_ids)
+        if indices is None:
+            positions = {param_id: i for i, param_id in enumerate(frame.param_ids)}
+            indices = self._frame_indices[frame.param_ids] = [positions.get(c.param.id) for c in self._channels]
+
+        t = frame.timestamp_ns / 1e9
+        self._latest_time = t
+        values = frame.values
+        for channel, index in zip(self._channels, indices):
+            if index is None:
+                channel.decimator.advance_to(t)
+                continue
+            value = values[index]
+            channel.history.append(t, value)
+            channel.decimator.add(t, value)
+            channel.last_value = value
+        self._dirty = True
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # while a splitter is dragged the old columns are stretched to the new width, and rebuilt once it rests
+        self._resize_timer.start()
+
+    @Slot()
+    def _resized(self):
+        self._rebuild_decimators()
+        self.update()
+
+    def _new_decimator(self):
+        width = max(1, self.width())
+        return ColumnDecimator(width, self._span / width)
+
+    def _rebuild_decimators(self):
+        if self._latest_time is None:
+            for channel in self._channels:
+                channel.decimator = self._new_decimator()
+            return
+        since = self._latest_time - self._span
+        for channel in self._channels:
+            decimator = self._new_decimator()
+            times, values = channel.history.window_since(since)
+            decimator.load(times, values, self._latest_time)
+            channel.decimator = decimator
+
+    @Slot()
+    def _repaint_if_dirty(self):
+        if self._dirty:
+            self._dirty = False
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        if not self._channels:
+            painter.setPen(self.palette().placeholderText().color())
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Select parameters in the table to chart them")
+            return
+
+        metrics = painter.fontMetrics()
+        legend_rows = (len(self._channels) + LEGEND_COLUMNS - 1) // LEGEND_COLUMNS
+        legend_height = legend_rows * metrics.height() + 4
+        plot = QRectF(0, legend_height, self.width(), self.height() - legend_height - 2)
+        column_width = self.width() / LEGEND_COLUMNS
+        for i, channel in enumerate(self._channels):
+            self._paint_channel(painter, channel, plot)
+            value = "-" if math.isnan(channel.last_value) else f"{channel.last_value:.6g}"
+            painter.setPen(channel.color)
+            painter.drawText(QPointF(4 + (i % LEGEND_COLUMNS) * column_width,
+                                     (i // LEGEND_COLUMNS) * metrics.height() + metrics.ascent() + 2),
+                             f"{channel.param.name}: {value} {channel.param.unit_label}")
+
+    def _paint_channel(self, painter, channel, plot):
+        decimator = channel.decimator
+        if decimator is None or decimator.last_column is None:
+            return
+        width = decimator.width
+        first_column = decimator.last_column - width + 1
+        first_slot = first_column % decimator.slots
+
+        # every channel is scaled to its own range over the visible span
+        low, high = min(decimator.mins), max(decimator.maxs)
+        if low == high:
+            low, high = low - 1, high + 1
+        scale = plot.height() / (high - low)
+        baseline = plot.bottom() + low * scale
+
+        # the whole ring is drawn twice, once shifted so the oldest slots start at the left edge and once
+        # shifted so slot 0 follows the newest of those, each clipped to its part of the chart. Slots are
+        # mapped to pixel columns by the painter transform so no points are created while painting.
+        painter.save()
+        pen = QPen(channel.color, 1)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        split_x = decimator.slots - first_slot
+        start_x = max(0, decimator.first_column - first_column)
+        stretch = plot.width() / width  # 1 unless the widget was resized since the columns were built
+        for clip_from, clip_to, shift in ((start_x, min(split_x, width), -first_slot),
+                                          (max(start_x, split_x), width, split_x)):
+            if clip_from >= clip_to:
+                continue
+            painter.resetTransform()
+            painter.setClipRect(QRectF(clip_from * stretch, plot.top(), (clip_to - clip_from) * stretch,
+                                       plot.height()))
+            painter.setTransform(QTransform(stretch, 0, 0, -scale, shift * stretch, baseline))
+            painter.drawPolyline(decimator.polygon)
+        painter.restore()
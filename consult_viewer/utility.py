@@ -1,3 +1,6 @@
+import time
+from contextlib import contextmanager
+
 from PySide6.QtGui import QFont
 
 
@@ -5,3 +8,28 @@ def resize_font(font: QFont, point_size: int):
     f = QFont(font)
     f.setPointSize(point_size)
     return f
+
+
+class StartupProfile:
+    '''
+    Collects the duration of the named steps of application startup.
+    '''
+    def __init__(self, start: float = None):
+        self._start = time.perf_counter() if start is None else start
+        self.steps = []
+
+    def add(self, name: str, seconds: float):
+        self.steps.append((name, seconds))
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def report(self) -> str:
+        lines = [f"{name:<40}{seconds * 1000:8.1f} ms" for name, seconds in self.steps]
+        lines.append(f"{'total until the event loop':<40}{(time.perf_counter() - self._start) * 1000:8.1f} ms")
+        return "\n".join(lines)
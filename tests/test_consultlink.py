@@ -0,0 +1,140 @@
+import math
+
+import pytest
+import serial
+
+from consultlink import ConsultSession, FrameParser, StreamLayout, StreamScheduler, FRAME_START
+from sessionfile import RecordedParameter
+
+
+def frame(payload: bytes) -> bytes:
+    return bytes((FRAME_START, len(payload))) + payload
+
+
+def test_frame_is_held_until_the_next_one_starts():
+    parser = FrameParser(2)
+    assert parser.feed(frame(b"ab")) == []
+    assert parser.feed(frame(b"cd")[:1]) == [b"ab"]
+    assert parser.feed(frame(b"cd")[1:] + frame(b"ef")) == [b"cd"]
+
+
+def test_request_echo_before_the_first_frame_is_not_a_desync():
+    parser = FrameParser(2)
+    assert parser.feed(b"\x5a\x01\x5a\x02\xf0" + frame(b"ab") + frame(b"cd")) == [b"ab"]
+    assert (parser.frames_discarded, parser.bytes_discarded, parser.desyncs) == (0, 0, 0)
+
+
+def test_desync_resyncs_at_the_next_confirmed_frame():
+    parser = FrameParser(2)
+    data = b"\xa5\x01\xa5\x02" + frame(b"ab") + frame(b"cd") + b"\xff\x02e" + frame(b"gh") + b"\xff\x02\xff\xffzz"
+    assert parser.feed(data) == [b"ab", b"cd", b"gh"]
+    assert parser.desyncs == 2
+    assert parser.frames_discarded == 2
+    assert parser.bytes_discarded == 5
+
+
+def test_frame_followed_by_garbage_is_discarded_byte_by_byte():
+    parser = FrameParser(2)
+    data = frame(b"ab") + frame(b"cd") + b"\x00\x00" + frame(b"ef") + frame(b"gh")
+    payloads = []
+    for i in range(len(data)):
+        payloads += parser.feed(data[i:i + 1])
+    assert payloads == [b"ab", b"ef"]
+    assert (parser.frames_discarded, parser.bytes_discarded, parser.desyncs) == (1, 6, 1)
+
+
+def test_flush_returns_the_trailing_frame():
+    parser = FrameParser(2)
+    assert parser.feed(frame(b"ab") + frame(b"cd")) == [b"ab"]
+    assert parser.flush() == [b"cd"]
+    assert parser.frames_discarded == 0
+    assert parser.flush() == []
+
+
+def test_flush_does_not_count_a_frame_cut_off_by_the_stop():
+    parser = FrameParser(2)
+    parser.feed(frame(b"ab") + frame(b"cd") + b"\xff\x02c")
+    assert parser.flush() == []
+    assert parser.frames_discarded == 0
+
+
+def test_flush_counts_a_trailing_frame_with_the_wrong_length():
+    parser = FrameParser(2)
+    parser.feed(frame(b"ab") + b"\xff\x05cd")
+    assert parser.flush() == []
+    assert (parser.frames_discarded, parser.bytes_discarded) == (1, 4)
+
+
+def test_stop_stream_returns_the_last_frame():
+    params = [RecordedParameter(1, "Engine Speed", "RPM", (0x00, 0x01), 12.5, 0.0),
+              RecordedParameter(2, "Coolant Temp", "C", (0x08,), 1.0, -50.0)]
+    layout = StreamLayout(params)
+    session = ConsultSession("loop://")
+    session._port = serial.serial_for_url("loop://", timeout=0.1)  # echoes the stream request like the ECU
+    try:
+        session.start_stream(layout)
+        session._port.write(frame(b"\x00\x10\x5a") + frame(b"\x00\x20\x5b"))
+        payloads = []
+        while len(payloads) < 1:
+            payloads += session.read_payloads()
+        assert payloads == [b"\x00\x10\x5a"]
+        assert session.stop_stream() == [b"\x00\x20\x5b"]
+        assert layout.decode(b"\x00\x20\x5b") == (400.0, 41.0)
+        assert session.frames_discarded == 0
+    finally:
+        session.close()
+
+
+SPEED = RecordedParameter(1, "Engine Speed", "RPM", (0x00, 0x01), 12.5, 0.0)
+COOLANT = RecordedParameter(2, "Coolant Temp", "C", (0x08,), 1.0, -50.0)
+BATTERY = RecordedParameter(3, "Battery Voltage", "V", (0x0c,), 0.08, 0.0)
+THROTTLE = RecordedParameter(4, "Throttle Position", "V", (0x0d,), 0.02, 0.0)
+
+
+def test_scheduler_without_target_rates_streams_every_parameter():
+    scheduler = StreamScheduler([SPEED, COOLANT])
+    assert not scheduler.multiplexed
+    assert scheduler.layout_at(0.0).param_ids == (1, 2)
+    assert scheduler.next_due(0.0) == math.inf
+
+
+def test_scheduler_samples_once_per_period():
+    scheduler = StreamScheduler([SPEED, BATTERY], {3: 1.0})
+    layout = scheduler.layout_at(0.0)
+    assert layout.param_ids == (1, 3)
+    assert scheduler.sampled(layout, 0.0)
+    assert not scheduler.sampled(scheduler.layout_at(0.01), 0.01)
+    assert scheduler.layout_at(0.5).param_ids == (1,)
+    assert scheduler.next_due(0.5) == pytest.approx(0.5)
+    # a second frame of the same period does not move the next one
+    assert scheduler.sampled(layout, 0.05)
+    assert scheduler.layout_at(1.0).param_ids == (1, 3)
+    # a late sample is anchored to when it was due
+    scheduler.sampled(layout, 1.1)
+    assert scheduler.layout_at(1.95).param_ids == (1,)
+    assert scheduler.layout_at(2.0).param_ids == (1, 3)
+
+
+def test_scheduler_keeps_parameters_due_within_a_few_restart_costs():
+    scheduler = StreamScheduler([SPEED, BATTERY, THROTTLE], {3: 20.0, 4: 1.0})
+    assert scheduler.layout_at(0.0).param_ids == (1, 3, 4)
+    assert scheduler.sampled(scheduler.layout_at(0.0), 0.0)
+    assert scheduler.layout_at(0.5).param_ids == (1, 3)
+    assert not scheduler.sampled(scheduler.layout_at(0.5), 0.5)
+    # once restarting the stream is measured to be slow, 1 Hz is kept in every frame as well
+    for _ in range(50):
+        scheduler.restarted(0.2)
+    assert scheduler.restart_cost == pytest.approx(0.2, rel=0.01)
+    assert scheduler.layout_at(0.5).param_ids == (1, 3, 4)
+
+
+def test_scheduler_batches_parameters_due_together():
+    scheduler = StreamScheduler([SPEED, BATTERY, THROTTLE], {3: 1.0, 4: 1.0})
+    scheduler.sampled(scheduler._layout([BATTERY]), 0.0)
+    scheduler.sampled(scheduler._layout([THROTTLE]), 0.1)
+    layout = scheduler.layout_at(1.0)
+    assert layout.param_ids == (1, 3, 4)
+    scheduler.sampled(layout, 1.0)
+    # both are anchored to their own period
+    assert scheduler.layout_at(1.95).param_ids == (1,)
+    assert scheduler.layout_at(2.0).param_ids == (1, 3, 4)
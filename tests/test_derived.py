@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+import pytest
+
+from derived import DerivedChannelStore, ExpressionError, parse_channel, parse_channels
+from sessionfile import RecordedParameter
+
+PARAMS = [RecordedParameter(1, "Engine Speed", "RPM", (0x00, 0x01), 12.5, 0.0),
+          RecordedParameter(2, "Injector Pulse Width", "ms", (0x14, 0x15), 0.01, 0.0),
+          RecordedParameter(3, "MAP Voltage", "V", (0x0c,), 0.02, 0.0)]
+
+
+def test_parse_channel():
+    channel = parse_channel("Injector Duty [%] = {Injector Pulse Width} * {engine speed} / 1200", PARAMS)
+    assert channel.id == "derived:Injector Duty"
+    assert channel.unit_label == "%"
+    assert channel.input_ids == (2, 1)
+    assert channel.evaluate(2.0, 3000.0) == pytest.approx(5.0)
+    assert channel.definition == "Injector Duty [%] = {Injector Pulse Width} * {engine speed} / 1200"
+
+
+def test_parameter_referenced_twice_is_one_input():
+    channel = parse_channel("Square = {Engine Speed} * {Engine Speed}", PARAMS)
+    assert channel.input_ids == (1,)
+    assert channel.unit_label == ""
+    assert channel.evaluate(3.0) == 9.0
+
+
+@pytest.mark.parametrize("definition", [
+    "no equals sign",
+    "Unknown = {Boost Pressure} * 2",
+    "Constant = 42",
+    "Syntax = {Engine Speed} *",
+    "Attribute = {Engine Speed}.real",
+    "Builtin = __import__('os')",
+    "Name = {Engine Speed} * x",
+    "Lambda = (lambda: 1)() + {Engine Speed}",
+    "Keyword = clip({Engine Speed}, low=0, high=1)",
+    "Chained = 0 < {Engine Speed} < 10",
+    "String = {Engine Speed} + 'a'",
+    "Subscript = {Engine Speed}[0]",
+])
+def test_invalid_expressions_are_rejected(definition):
+    with pytest.raises(ExpressionError):
+        parse_channel(definition, PARAMS)
+
+
+@pytest.mark.parametrize("expression", [
+    "max({Engine Speed})",
+    "min({Engine Speed}, 1, 2)",
+    "abs({Engine Speed}, 2)",
+    "sqrt() + {Engine Speed}",
+    "clip({Engine Speed}, 1)",
+    "where({Engine Speed} > 1, 2)",
+])
+def test_functions_called_with_the_wrong_number_of_arguments_are_rejected(expression):
+    with pytest.raises(ExpressionError, match="takes"):
+        parse_channel(f"Arity = {expression}", PARAMS)
+
+
+def test_non_finite_results_are_nan():
+    channel = parse_channel("Ratio = {Engine Speed} / {MAP Voltage}", PARAMS)
+    assert math.isnan(channel.evaluate(1.0, 0.0))
+    assert math.isnan(parse_channel("Log = log({Engine Speed})", PARAMS).evaluate(-1.0))
+    result = channel.evaluate_array(np.array([1.0, 1.0, 0.0]), np.array([2.0, 0.0, 0.0]))
+    assert result[0] == 0.5
+    assert np.isnan(result[1:]).all()
+
+
+def test_scalar_and_array_evaluation_agree():
+    channel = parse_channel("Boost [kPa] = where({MAP Voltage} > 2, clip({MAP Voltage} * 50 - 101.3, 0, 200), "
+                            "max(sqrt(abs({Engine Speed})), exp(-1)))", PARAMS)
+    speeds = np.array([0.0, 900.0, 6500.0, 3000.0])
+    voltages = np.array([0.5, 2.5, 4.9, 1.0])
+    assert channel.evaluate_array(*[{1: speeds, 3: voltages}[i] for i in channel.input_ids]).tolist() == \
+        [channel.evaluate(*[{1: s, 3: v}[i] for i in channel.input_ids]) for s, v in zip(speeds, voltages)]
+
+
+def test_parse_channels_skips_blank_lines_and_rejects_duplicates():
+    channels = parse_channels(["A = {Engine Speed}", "  ", "B = {MAP Voltage} * 2"], PARAMS)
+    assert [channel.name for channel in channels] == ["A", "B"]
+    with pytest.raises(ExpressionError, match="twice"):
+        parse_channels(["A = {Engine Speed}", "A [x] = {MAP Voltage}"], PARAMS)
+
+
+def test_store_round_trip():
+    class Settings(dict):
+        def value(self, key, default=None):
+            return self.get(key, default)
+
+        def setValue(self, key, value):
+            self[key] = value
+
+    store = DerivedChannelStore(Settings())
+    assert store.definitions() == []
+    channels = parse_channels(["A [x] = {Engine Speed} / 2"], PARAMS)
+    store.save(channels)
+    assert store.definitions() == ["A [x] = {Engine Speed} / 2"]
+
+
+def test_complex_results_are_nan():
+    channel = parse_channel("Root = {Engine Speed} ** 0.5", PARAMS)
+    assert math.isnan(channel.evaluate(-4.0))
+    assert channel.evaluate(4.0) == 2.0
+    assert np.isnan(channel.evaluate_array(np.array([-4.0]))).all()
+
+
+@pytest.mark.parametrize("expression", [
+    "max({Engine Speed}, 0)",
+    "max(0, {Engine Speed})",
+    "min({Engine Speed}, 0)",
+    "min(0, {Engine Speed})",
+    "clip({Engine Speed}, 0, 1)",
+])
+def test_nan_inputs_give_the_same_result_in_both_paths(expression):
+    channel = parse_channel(f"Channel = {expression}", PARAMS)
+    values = np.array([math.nan, -1.0, 0.5, 2.0])
+    array_results = channel.evaluate_array(values)
+    scalar_results = [channel.evaluate(value) for value in values]
+    assert np.array_equal(array_results, scalar_results, equal_nan=True)
+    assert math.isnan(scalar_results[0])
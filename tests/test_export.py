@@ -0,0 +1,84 @@
+import csv
+
+import numpy as np
+import pytest
+
+from consultlink import Frame
+from derived import parse_channels
+from export import column_names, convert_chunk, export_session, recorded_channels, ExportError, ROW_GROUP_ROWS
+from recorder import SessionRecorder
+from sessionfile import SessionReader, RecordedParameter
+
+SPEED = RecordedParameter(1, "Engine Speed", "RPM", (0x00, 0x01), 12.5, 0.0)
+COOLANT = RecordedParameter(2, "Coolant Temp", "C", (0x08,), 1.0, -50.0)
+SENSOR = RecordedParameter(3, "Sensor", "", (0x20, 0x21, 0x22), 0.5, 0.0)
+PARAMS = [SPEED, COOLANT, SENSOR]
+PARAM_IDS = tuple(p.id for p in PARAMS)
+START_NS = 5_000_000_000
+
+
+def record(path, frames, derived=(), buffer_frames=1024):
+    recorder = SessionRecorder(str(path), PARAMS, buffer_frames, derived)
+    recorder.start()
+    for frame in frames:
+        recorder.write(frame)
+    recorder.stop()
+    return str(path)
+
+
+@pytest.fixture
+def session_path(tmp_path):
+    derived = parse_channels(["Hot [C] = max({Coolant Temp} - 90, 0)", "Ratio = {Engine Speed} / {Sensor}"], PARAMS)
+    frames = [Frame(START_NS, (1, 3), b"\x01\x02\x00\x01\x00", (), PARAM_IDS),  # coolant not received yet
+              Frame(START_NS + 20_000_000, PARAM_IDS, b"\x00\x10\x96\x01\x02\x03", (), PARAM_IDS),
+              Frame(START_NS + 40_000_000, (2,), b"\x28", (), PARAM_IDS)]
+    return record(tmp_path / "session.cvrec", frames, derived)
+
+
+def test_convert_chunk(session_path):
+    reader = SessionReader(session_path)
+    try:
+        derived = recorded_channels(reader)
+        assert column_names(reader, derived) == ["time_s", "Engine Speed [RPM]", "Coolant Temp [C]", "Sensor",
+                                                 "Hot [C]", "Ratio"]
+        time_s, speed, coolant, sensor, hot, ratio = convert_chunk(reader, 0, derived)
+        assert time_s.tolist() == pytest.approx([0.0, 0.02, 0.04])
+        # registers are MSB first
+        assert speed.tolist() == [0x0102 * 12.5, 0x0010 * 12.5, 0x0010 * 12.5]
+        assert sensor.tolist() == [0x000100 * 0.5, 0x010203 * 0.5, 0x010203 * 0.5]
+        # a value the presence mask marks absent is NaN, and so is a derived channel computed from it
+        assert np.isnan(coolant[0]) and coolant[1:].tolist() == [100.0, -10.0]
+        assert np.isnan(hot[0]) and hot[1:].tolist() == [10.0, 0.0]
+        assert ratio.tolist() == pytest.approx((speed / sensor).tolist())
+    finally:
+        reader.close()
+
+
+def test_export_csv(session_path, tmp_path):
+    out_path = tmp_path / "session.csv"
+    assert export_session(session_path, str(out_path)) == 3
+    with open(out_path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["time_s", "Engine Speed [RPM]", "Coolant Temp [C]", "Sensor", "Hot [C]", "Ratio"]
+    assert rows[1][2] == "nan"
+    assert [float(value) for value in rows[2][:5]] == [0.02, 200.0, 100.0, 0x010203 * 0.5, 10.0]
+
+
+def test_unknown_format(session_path, tmp_path):
+    with pytest.raises(ExportError):
+        export_session(session_path, str(tmp_path / "session.xlsx"))
+
+
+def test_parquet_row_groups_span_many_chunks(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    count = ROW_GROUP_ROWS + 5000
+    frames = (Frame(START_NS + i * 1_000_000, PARAM_IDS, (i & 0xFFFF).to_bytes(2, "big") + b"\x50\x00\x00\x01", (),
+                    PARAM_IDS) for i in range(count))
+    session_path = record(tmp_path / "long.cvrec", frames, buffer_frames=count)
+    out_path = str(tmp_path / "long.parquet")
+    assert export_session(session_path, out_path) == count
+    metadata = pq.ParquetFile(out_path).metadata
+    assert metadata.num_rows == count
+    assert metadata.num_row_groups == 2
+    speed = pq.read_table(out_path).column("Engine Speed [RPM]").to_numpy()
+    assert np.array_equal(speed, (np.arange(count) & 0xFFFF) * 12.5)
@@ -0,0 +1,65 @@
+from consultlink import Frame
+from recorder import SessionRecorder
+from sessionfile import SessionReader, RecordedParameter
+
+SPEED = RecordedParameter(1, "Engine Speed", "RPM", (0x00, 0x01), 12.5, 0.0)
+COOLANT = RecordedParameter(2, "Coolant Temp", "C", (0x08,), 1.0, -50.0)
+BATTERY = RecordedParameter(3, "Battery Voltage", "V", (0x0c,), 0.08, 0.0)
+THROTTLE = RecordedParameter(4, "Throttle Position", "V", (0x0d,), 0.02, 0.0)
+AVAILABLE = [SPEED, COOLANT, BATTERY, THROTTLE]
+
+
+def record(tmp_path, params, frames, **kwargs):
+    path = str(tmp_path / "session.cvrec")
+    recorder = SessionRecorder(path, params, available_params=AVAILABLE, **kwargs)
+    recorder.start()
+    for frame in frames:
+        recorder.write(frame)
+    recorder.stop()
+    reader = SessionReader(path)
+    try:
+        return recorder, [(payload, presence) for _, _, payload, presence in reader.records()]
+    finally:
+        reader.close()
+
+
+def frame(i, params, payload, stream=None):
+    return Frame(i, tuple(p.id for p in params), payload, (), tuple(p.id for p in stream or params))
+
+
+def test_parameter_enabled_while_recording_is_passed_over(tmp_path):
+    frames = [frame(i, [SPEED, COOLANT], b"\x01\x02\x03") for i in range(5)]
+    frames += [frame(i, [SPEED, BATTERY, COOLANT], b"\x04\x05\xbb\x06") for i in range(5, 100)]
+    recorder, records = record(tmp_path, [SPEED, COOLANT], frames)
+    assert (recorder.frames_written, recorder.frames_skipped) == (100, 0)
+    assert records[4] == (b"\x01\x02\x03", b"\x03")
+    assert records[99] == (b"\x04\x05\x06", b"\x03")
+
+
+def test_frame_without_recorded_parameters_is_skipped(tmp_path):
+    frames = [frame(0, [SPEED, COOLANT], b"\x01\x02\x03"), frame(1, [BATTERY], b"\xbb"),
+              frame(2, [SPEED, COOLANT], b"\x04\x05\x06")]
+    recorder, records = record(tmp_path, [SPEED, COOLANT], frames)
+    assert (recorder.frames_written, recorder.frames_skipped) == (2, 1)
+
+
+def test_partial_frames_are_merged_into_the_last_payload(tmp_path):
+    stream = [SPEED, COOLANT, BATTERY]
+    frames = [frame(0, [SPEED, BATTERY], b"\x01\x02\x0b", stream),
+              frame(1, [SPEED, COOLANT], b"\x03\x04\x05", stream),
+              frame(2, [SPEED], b"\x06\x07", stream)]
+    recorder, records = record(tmp_path, stream, frames)
+    # a parameter not received yet is absent rather than zero
+    assert records == [(b"\x01\x02\x00\x0b", b"\x05"),
+                       (b"\x03\x04\x05\x0b", b"\x07"),
+                       (b"\x06\x07\x05\x0b", b"\x07")]
+
+
+def test_parameter_leaving_the_stream_is_absent(tmp_path):
+    frames = [frame(0, [SPEED, COOLANT], b"\x01\x02\x03"),
+              frame(1, [SPEED], b"\x04\x05"),
+              frame(2, [SPEED, COOLANT], b"\x06\x07\x08")]
+    recorder, records = record(tmp_path, [SPEED, COOLANT], frames)
+    assert records == [(b"\x01\x02\x03", b"\x03"),
+                       (b"\x04\x05\x03", b"\x01"),
+                       (b"\x06\x07\x08", b"\x03")]
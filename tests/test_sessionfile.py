@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from consultlink import Frame
+from recorder import SessionRecorder, CHUNK_RECORDS
+from sessionfile import (SessionReader, SessionFormatError, RecordedParameter, INDEX_TRAILER, CHUNK_HEADER,
+                         SESSION_HEADER)
+
+PARAMS = [RecordedParameter(1, "Engine Speed", "RPM", (0x00, 0x01), 12.5, 0.0),
+          RecordedParameter(2, "Coolant Temp", "C", (0x08,), 1.0, -50.0)]
+PARAM_IDS = tuple(p.id for p in PARAMS)
+FRAMES = 2 * CHUNK_RECORDS + 100
+START_NS = 1_000_000_000
+STEP_NS = 10_000_000
+
+
+def timestamp(i):
+    return START_NS + i * STEP_NS
+
+
+@pytest.fixture
+def session_path(tmp_path):
+    path = str(tmp_path / "session.cvrec")
+    recorder = SessionRecorder(path, PARAMS, buffer_frames=FRAMES)
+    recorder.start()
+    for i in range(FRAMES):
+        payload = bytes((i >> 8 & 0xFF, i & 0xFF, i % 200))
+        recorder.write(Frame(timestamp(i), PARAM_IDS, payload, (), PARAM_IDS))
+    recorder.stop()
+    assert recorder.frames_written == FRAMES
+    return path
+
+
+def test_records_round_trip(session_path):
+    reader = SessionReader(session_path)
+    try:
+        assert reader.frame_count == FRAMES
+        assert reader.chunk_count == 3
+        records = list(reader.records())
+        assert len(records) == FRAMES
+        position, timestamp_ns, payload, presence = records[CHUNK_RECORDS + 5]
+        assert position == (1, 5)
+        assert timestamp_ns == timestamp(CHUNK_RECORDS + 5)
+        assert payload == bytes(((CHUNK_RECORDS + 5) >> 8, (CHUNK_RECORDS + 5) & 0xFF, (CHUNK_RECORDS + 5) % 200))
+        assert presence == b"\x03"
+    finally:
+        reader.close()
+
+
+def test_seek(session_path):
+    reader = SessionReader(session_path)
+    try:
+        assert reader.seek(0) == (0, 0)
+        assert reader.seek(timestamp(0)) == (0, 0)
+        assert reader.seek(timestamp(10)) == (0, 10)
+        assert reader.seek(timestamp(10) + 1) == (0, 11)
+        # the first record of a chunk, and a timestamp between the last record of a chunk and it
+        assert reader.seek(timestamp(CHUNK_RECORDS)) == (1, 0)
+        assert reader.seek(timestamp(CHUNK_RECORDS) - 1) == (1, 0)
+        assert reader.seek(timestamp(FRAMES - 1)) == (2, 99)
+        assert reader.seek(timestamp(FRAMES - 1) + 1) is None
+        assert reader.timestamp_at(reader.seek(timestamp(1500))) == timestamp(1500)
+    finally:
+        reader.close()
+
+
+def test_index_is_rebuilt_without_trailer(session_path):
+    with open(session_path, "r+b") as file:
+        file.truncate(os.path.getsize(session_path) - INDEX_TRAILER.size)
+    reader = SessionReader(session_path)
+    try:
+        assert reader.chunk_count == 3
+        assert reader.frame_count == FRAMES
+        assert reader.seek(timestamp(CHUNK_RECORDS + 1)) == (1, 1)
+    finally:
+        reader.close()
+
+
+def test_truncated_chunk_is_dropped(session_path):
+    reader = SessionReader(session_path)
+    last_chunk_offset = reader._chunk_offsets[-1]
+    reader.close()
+    # cut the last chunk in the middle of a record, as a crash while recording would
+    with open(session_path, "r+b") as file:
+        file.truncate(last_chunk_offset + CHUNK_HEADER.size + 10 * reader.record_size + 3)
+    reader = SessionReader(session_path)
+    try:
+        assert reader.chunk_count == 2
+        assert reader.frame_count == 2 * CHUNK_RECORDS
+        assert reader.end_ns == timestamp(2 * CHUNK_RECORDS - 1)
+        assert reader.seek(timestamp(CHUNK_RECORDS + 1)) == (1, 1)
+        assert reader.seek(timestamp(2 * CHUNK_RECORDS)) is None
+        assert len(list(reader.records(reader.seek(timestamp(2 * CHUNK_RECORDS - 3))))) == 3
+    finally:
+        reader.close()
+
+
+def test_not_a_session_file(tmp_path):
+    path = tmp_path / "other.cvrec"
+    path.write_bytes(b"not a session")
+    with pytest.raises(SessionFormatError):
+        SessionReader(str(path))
+    path.write_bytes(b"")
+    with pytest.raises(SessionFormatError):
+        SessionReader(str(path))
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.parametrize("damage", [
+    lambda description: description[:len(description) // 2],  # truncated JSON
+    lambda description: b"\xff" + description[1:],  # not UTF-8
+    lambda description: description.replace(b'"record_size"', b'"record_sizes"'),  # missing field
+    lambda description: description.replace(b'"frame_length": 3', b'"frame_length": 4'),  # inconsistent layout
+    lambda description: description.replace(b'"registers": [0, 1]', b'"registers": 7'),  # wrong type
+])
+def test_damaged_header_is_a_format_error(session_path, damage):
+    with open(session_path, "rb") as file:
+        data = file.read()
+    _, _, header_length = SESSION_HEADER.unpack_from(data, 0)
+    description = data[SESSION_HEADER.size:SESSION_HEADER.size + header_length]
+    damaged = damage(description)
+    assert damaged != description
+    with open(session_path, "wb") as file:
+        file.write(SESSION_HEADER.pack(*SESSION_HEADER.unpack_from(data, 0)[:2], len(damaged)) + damaged
+                   + data[SESSION_HEADER.size + header_length:])
+    fds = open_fds()
+    with pytest.raises(SessionFormatError):
+        SessionReader(session_path)
+    assert open_fds() == fds